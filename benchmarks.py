@@ -0,0 +1,313 @@
+"""Micro-benchmarks for the extraction hot paths over a corpus of saved pages
+
+    python benchmarks.py emails path/to/corpus [--repeat 5]
+    python benchmarks.py links path/to/corpus [--repeat 5]
+    python benchmarks.py maps path/to/saved_maps_pages [--repeat 5]
+
+The corpus is a directory of saved .html/.htm files. Each benchmark checks
+that the optimised path returns the same results as the original one.
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+from playwright.async_api import async_playwright
+
+from email_crawler import LINK_BACKENDS, extract_emails_from_text
+from maps_scraper import CARD_SELECTOR, extract_cards
+
+
+def legacy_is_valid_email(email):
+    """Reference copy of the original per-call validation"""
+    if len(email) > 254 or len(email) < 5:
+        return False
+
+    # Reject if contains common image extensions
+    image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+    if any(ext in email.lower() for ext in image_extensions):
+        return False
+
+    # Reject if contains dimensions (like 768x960)
+    if re.search(r'\d+x\d+', email):
+        return False
+
+    # Reject if contains @2x or similar scale markers
+    if re.search(r'@\d+x', email):
+        return False
+
+    # Check for common file naming patterns
+    invalid_patterns = [
+        r'-\d+x\d+',  # Dimension markers
+        r'_\d+x\d+',  # Underscore dimensions
+        r'[\w-]+shot',  # Screenshot/headshot
+        r'head-shot',
+        r'thumbnail',
+        r'avatar',
+        r'profile-pic'
+    ]
+
+    if any(re.search(pattern, email.lower()) for pattern in invalid_patterns):
+        return False
+
+    # Basic email pattern validation
+    email_pattern = r'^[a-zA-Z0-9][a-zA-Z0-9._%+-]*@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    if not re.match(email_pattern, email):
+        return False
+
+    # Additional checks for valid email
+    parts = email.split('@')
+    if len(parts) != 2:
+        return False
+
+    local_part, domain = parts
+
+    # Check domain part
+    if not all(part.isalnum() or part == '-' for part in domain.split('.')):
+        return False
+
+    # Check for consecutive special characters
+    if re.search(r'[._%+-]{2,}', local_part):
+        return False
+
+    # Check for common valid email domains (optional)
+    common_domains = ['.com', '.org', '.net', '.edu', '.gov', '.mil', '.biz', '.info']
+    if not any(domain.lower().endswith(d) for d in common_domains):
+        # If not a common domain, be more strict
+        if len(domain) > 50:  # Unusually long domain
+            return False
+
+    return True
+
+
+def legacy_extract_emails_from_text(text):
+    """Reference copy of the original four full-text regex passes"""
+    email_patterns = [
+        # Standard email format
+        r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+
+        # Protected email formats
+        r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s*[\[\(]\s*at\s*[\]\)]\s*[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s+at\s+[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+
+        # Spaced email format
+        r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s*@\s*[A-Za-z0-9.-]+\s*\.\s*[A-Z|a-z]{2,}\b',
+    ]
+
+    emails = set()
+    for pattern in email_patterns:
+        found = re.findall(pattern, text, re.IGNORECASE)
+        for email in found:
+            # Clean and normalize email
+            clean_email = re.sub(r'\s+|\[at\]|\(at\)|\s*at\s*', '@', email)
+            clean_email = clean_email.strip().lower()
+            if legacy_is_valid_email(clean_email):
+                emails.add(clean_email)
+    return emails
+
+
+async def legacy_extract_business_info(page):
+    """Reference copy of the original per-element Maps card extraction"""
+    businesses = []
+    business_elements = await page.query_selector_all('.bfdHYd')
+
+    for element in business_elements:
+        try:
+            business = {}
+
+            name_elem = await element.query_selector('.qBF1Pd')
+            if name_elem:
+                business['name'] = await name_elem.inner_text()
+
+            rating_elem = await element.query_selector('.MW4etd')
+            reviews_elem = await element.query_selector('.UY7F9')
+            if rating_elem:
+                business['rating'] = await rating_elem.inner_text()
+            if reviews_elem:
+                reviews_text = await reviews_elem.inner_text()
+                business['reviews'] = re.search(r'\((\d+)\)', reviews_text).group(1)
+
+            type_location = await element.query_selector_all('.W4Efsd span')
+            if type_location:
+                business['type'] = await type_location[0].inner_text()
+                if len(type_location) > 2:
+                    business['location'] = await type_location[2].inner_text()
+
+            details = await element.query_selector_all('.W4Efsd .W4Efsd span')
+            for detail in details:
+                text = await detail.inner_text()
+                if 'Open' in text or 'Closed' in text:
+                    business['hours'] = text
+                if re.match(r'\d{3}[\s-]?\d{3}[\s-]?\d{4}', text):
+                    business['phone'] = text
+
+            services = await element.query_selector_all('.ah5Ghc span')
+            if services:
+                business['services'] = [await service.inner_text() for service in services]
+
+            if business:
+                businesses.append(business)
+        except Exception:
+            continue
+    return businesses
+
+
+def load_corpus(path):
+    """Read every saved HTML page under path"""
+    pages = []
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.lower().endswith(('.html', '.htm')):
+                with open(os.path.join(root, name), encoding='utf-8', errors='replace') as f:
+                    pages.append((name, f.read()))
+    return pages
+
+
+def time_pass(func, pages, repeat):
+    """Best-of-repeat wall time for one pass over the corpus, and its results"""
+    best = None
+    for _ in range(repeat):
+        results = []
+        started = time.perf_counter()
+        for _, content in pages:
+            results.append(func(content))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def slowest_page(func, pages):
+    """Longest single call, i.e. how long the event loop would be blocked"""
+    worst = 0.0
+    for _, content in pages:
+        started = time.perf_counter()
+        func(content)
+        worst = max(worst, time.perf_counter() - started)
+    return worst
+
+
+def report(label, elapsed, total_bytes, items, unit):
+    mb_per_s = total_bytes / 1024 / 1024 / elapsed if elapsed else float('inf')
+    per_s = items / elapsed if elapsed else float('inf')
+    print(f"{label:<10} {elapsed * 1000:9.1f} ms  {mb_per_s:8.2f} MB/s  {per_s:10.1f} {unit}/s")
+
+
+def bench_emails(pages, repeat):
+    total_bytes = sum(len(content.encode('utf-8')) for _, content in pages)
+    legacy_time, legacy_results = time_pass(legacy_extract_emails_from_text, pages, repeat)
+    new_time, new_results = time_pass(extract_emails_from_text, pages, repeat)
+
+    mismatches = [name for (name, _), a, b in zip(pages, legacy_results, new_results) if a != b]
+    found = sum(len(r) for r in new_results)
+    print(f"{len(pages)} pages, {total_bytes / 1024 / 1024:.2f} MB, {found} emails")
+    report("legacy", legacy_time, total_bytes, found, "emails")
+    report("scanner", new_time, total_bytes, found, "emails")
+    if new_time:
+        print(f"speedup    {legacy_time / new_time:.1f}x")
+    for name in mismatches:
+        print(f"MISMATCH   {name}")
+    return not mismatches
+
+
+def bench_links(pages, repeat):
+    total_bytes = sum(len(content.encode('utf-8')) for _, content in pages)
+    page_url = 'https://example.com/'
+    print(f"{len(pages)} pages, {total_bytes / 1024 / 1024:.2f} MB")
+
+    reference = None
+    ok = True
+    for name, extract in sorted(LINK_BACKENDS.items()):
+        func = lambda content, extract=extract: extract(content, page_url)
+        elapsed, results = time_pass(func, pages, repeat)
+        found = sum(len(r) for r in results)
+        report(name, elapsed, total_bytes, found, "links")
+        print(f"{'':<10} slowest page blocks for {slowest_page(func, pages) * 1000:.1f} ms")
+
+        urls = [set(r) for r in results]
+        if reference is None:
+            reference = urls
+        for (page_name, _), expected, got in zip(pages, reference, urls):
+            if expected != got:
+                ok = False
+                print(f"MISMATCH   {name} {page_name}: {len(expected ^ got)} differing links")
+    return ok
+
+
+async def time_maps_pass(extract, page, pages, repeat):
+    best = None
+    results = []
+    for _ in range(repeat):
+        elapsed = 0.0
+        results = []
+        for _, content in pages:
+            await page.set_content(content)
+            started = time.perf_counter()
+            results.append(await extract(page))
+            elapsed += time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+async def run_maps_benchmark(pages, repeat):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        page = await browser.new_page()
+        # Page loads are excluded from the timings; only extraction is measured
+        legacy_time, legacy_results = await time_maps_pass(legacy_extract_business_info, page, pages, repeat)
+        new_time, new_results = await time_maps_pass(extract_cards, page, pages, repeat)
+        cards = 0
+        for _, content in pages:
+            await page.set_content(content)
+            cards += len(await page.query_selector_all(CARD_SELECTOR))
+        await browser.close()
+    return cards, legacy_time, legacy_results, new_time, new_results
+
+
+def bench_maps(pages, repeat):
+    total_bytes = sum(len(content.encode('utf-8')) for _, content in pages)
+    cards, legacy_time, legacy_results, new_time, new_results = asyncio.run(run_maps_benchmark(pages, repeat))
+    print(f"{len(pages)} pages, {total_bytes / 1024 / 1024:.2f} MB, {cards} cards")
+    report("legacy", legacy_time, total_bytes, cards, "cards")
+    report("evaluate", new_time, total_bytes, cards, "cards")
+    if new_time:
+        print(f"speedup    {legacy_time / new_time:.1f}x")
+
+    ok = True
+    for (name, _), expected, got in zip(pages, legacy_results, new_results):
+        # The place link is an extra field the legacy path never read
+        got = [{key: value for key, value in business.items() if key != 'link'} for business in got]
+        missing = [business for business in expected if business not in got]
+        if missing:
+            ok = False
+            print(f"MISMATCH   {name}: {len(missing)} legacy records not reproduced")
+        elif len(got) > len(expected):
+            # The old path dropped cards whose review count it could not parse
+            print(f"note       {name}: {len(got) - len(expected)} cards the legacy path skipped")
+    return ok
+
+
+BENCHMARKS = {
+    'emails': bench_emails,
+    'links': bench_links,
+    'maps': bench_maps,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction hot paths on saved pages")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('corpus', help="Directory of saved HTML pages")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per path; the best is reported")
+    args = parser.parse_args(argv)
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        parser.error(f"no .html files found in {args.corpus}")
+    ok = BENCHMARKS[args.benchmark](pages, args.repeat)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Per-page timing spans, crawl metrics, a Prometheus text endpoint and profiling hooks"""
+import cProfile
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument is optional; cProfile is always available
+    Profiler = None
+
+# Phases a page can go through, in pipeline order
+PAGE_PHASES = (
+    'cache_lookup', 'static_fetch', 'browser_acquire', 'navigation', 'content',
+    'parse', 'email_scan', 'link_extract', 'page',
+)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf past the last bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        return float('inf')
+
+
+class PageSpan:
+    """Timings and outcome of one page, filled in as it moves through the pipeline"""
+
+    def __init__(self, url):
+        self.url = url
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.tier = None  # 'cache', 'static', 'browser', 'skipped' or 'failed'
+        self.bytes = 0
+        self.emails = 0
+        self.timeouts = 0
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def finish(self):
+        self.phases['page'] = time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            'url': self.url,
+            'tier': self.tier,
+            'bytes': self.bytes,
+            'emails': self.emails,
+            'timeouts': self.timeouts,
+            'ms': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+        }
+
+
+class CrawlMetrics:
+    """Counters and histograms fed by finished page spans; safe to read from other threads"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.pages = {}  # tier -> pages
+        self.bytes = 0
+        self.emails = 0
+        self.timeouts = 0
+        self.phase_seconds = {name: Histogram(SECONDS_BUCKETS) for name in PAGE_PHASES}
+        self.emails_per_page = Histogram(COUNT_BUCKETS)
+        self._lock = threading.Lock()
+
+    def record_page(self, span):
+        with self._lock:
+            self.pages[span.tier] = self.pages.get(span.tier, 0) + 1
+            self.bytes += span.bytes
+            self.emails += span.emails
+            self.timeouts += span.timeouts
+            for name, seconds in span.phases.items():
+                self.phase_seconds[name].observe(seconds)
+            self.emails_per_page.observe(span.emails)
+        logging.debug(f"Page span: {json.dumps(span.as_dict())}")
+
+    def pages_per_second(self):
+        elapsed = time.time() - self.started
+        return sum(self.pages.values()) / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'pages': dict(self.pages),
+                'pages_per_second': round(self.pages_per_second(), 3),
+                'bytes': self.bytes,
+                'emails': self.emails,
+                'timeouts': self.timeouts,
+                'emails_per_page_mean': round(self.emails_per_page.sum / self.emails_per_page.count, 3)
+                if self.emails_per_page.count else 0.0,
+                'phases': {
+                    name: {
+                        'count': histogram.count,
+                        'total_seconds': round(histogram.sum, 3),
+                        'p50_seconds': histogram.quantile(0.5),
+                        'p95_seconds': histogram.quantile(0.95),
+                    }
+                    for name, histogram in self.phase_seconds.items() if histogram.count
+                },
+            }
+
+    def prometheus_text(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram_lines(name, histogram, labels=''):
+            prefix = f"{labels}," if labels else ''
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+            suffix = f"{{{labels}}}" if labels else ''
+            lines.append(f"{name}_sum{suffix} {histogram.sum}")
+            lines.append(f"{name}_count{suffix} {histogram.count}")
+
+        with self._lock:
+            header('email_crawler_pages_total', 'counter', "Pages processed, by fetch tier")
+            for tier, count in sorted(self.pages.items(), key=lambda item: str(item[0])):
+                lines.append(f'email_crawler_pages_total{{tier="{tier}"}} {count}')
+            header('email_crawler_pages_per_second', 'gauge', "Pages processed per second since start")
+            lines.append(f"email_crawler_pages_per_second {self.pages_per_second()}")
+            header('email_crawler_bytes_total', 'counter', "Bytes of page content fetched")
+            lines.append(f"email_crawler_bytes_total {self.bytes}")
+            header('email_crawler_emails_total', 'counter', "Emails found on processed pages")
+            lines.append(f"email_crawler_emails_total {self.emails}")
+            header('email_crawler_timeouts_total', 'counter', "Fetch and navigation timeouts")
+            lines.append(f"email_crawler_timeouts_total {self.timeouts}")
+            header('email_crawler_phase_seconds', 'histogram', "Time spent per page in each phase")
+            for name, histogram in self.phase_seconds.items():
+                histogram_lines('email_crawler_phase_seconds', histogram, f'phase="{name}"')
+            header('email_crawler_emails_per_page', 'histogram', "Emails found per page")
+            histogram_lines('email_crawler_emails_per_page', self.emails_per_page)
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        data = self.as_dict()
+        pages = sum(data['pages'].values())
+        page = data['phases'].get('page')
+        latency = f", p50 {page['p50_seconds']}s / p95 {page['p95_seconds']}s per page" if page else ''
+        return (f"{pages} pages at {data['pages_per_second']:.2f}/s, "
+                f"{data['bytes'] / 1024 / 1024:.1f} MB, {data['timeouts']} timeouts{latency}")
+
+
+class MetricsServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a background thread"""
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self.server = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = metrics.prometheus_text().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body = json.dumps(metrics.as_dict()).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+@contextmanager
+def profiled(profiler, output):
+    """Profile the enclosed block with 'cprofile' (pstats file) or 'pyinstrument' (HTML)"""
+    if profiler == 'pyinstrument':
+        if Profiler is None:
+            raise RuntimeError("pyinstrument is not installed (pip install pyinstrument)")
+        profile = Profiler(async_mode='enabled')
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+    else:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(output)
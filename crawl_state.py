@@ -0,0 +1,174 @@
+"""Persistent crawl state (frontier, visited pages, emails) for checkpoint and resume"""
+import sqlite3
+import time
+
+
+class CrawlStateStore:
+    """SQLite (WAL) store shared by every crawl in a process; writes are batched
+
+    Frontier inserts run at once (their primary key is the crawl's URL dedup)
+    but are only committed with the next flush, like the buffered writes.
+    """
+
+    def __init__(self, path, batch_size=200, flush_interval=2.0):
+        self.path = path
+        self.batch_size = batch_size  # Buffered operations that trigger a flush
+        self.flush_interval = flush_interval  # Seconds between flushes at most
+        self.db = None
+        self._uncommitted = 0  # Frontier inserts waiting for the next commit
+        self._visited = []
+        self._emails = []
+        self._spilled = {}  # crawl_id -> frontier rows waiting on disk, so refills skip SQLite when none do
+        self._last_flush = time.monotonic()
+
+    def open(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS crawls (
+                crawl_id TEXT PRIMARY KEY,
+                base_url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS frontier (
+                crawl_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                score REAL NOT NULL,
+                seq INTEGER NOT NULL,
+                depth INTEGER NOT NULL,
+                spilled INTEGER NOT NULL,
+                PRIMARY KEY (crawl_id, key)
+            );
+            CREATE INDEX IF NOT EXISTS frontier_spilled ON frontier (crawl_id, spilled, score DESC, seq);
+            CREATE TABLE IF NOT EXISTS visited (
+                crawl_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                PRIMARY KEY (crawl_id, key)
+            );
+            CREATE TABLE IF NOT EXISTS emails (
+                crawl_id TEXT NOT NULL,
+                email TEXT NOT NULL,
+                source_url TEXT,
+                PRIMARY KEY (crawl_id, email)
+            );
+        ''')
+        self.db.commit()
+        return self
+
+    def status(self, crawl_id):
+        row = self.db.execute('SELECT status FROM crawls WHERE crawl_id = ?', (crawl_id,)).fetchone()
+        return row[0] if row else None
+
+    def start_crawl(self, crawl_id, base_url, resume=False):
+        """Register a crawl; returns True when resuming saved state"""
+        self.flush()
+        existing = self.status(crawl_id) is not None
+        if existing and not resume:
+            for table in ('frontier', 'visited', 'emails'):
+                self.db.execute(f'DELETE FROM {table} WHERE crawl_id = ?', (crawl_id,))
+        self.db.execute(
+            'INSERT OR REPLACE INTO crawls VALUES (?, ?, ?, ?)',
+            (crawl_id, base_url, 'running', time.time())
+        )
+        self.db.commit()
+        self._spilled[crawl_id] = 0
+        return existing and resume
+
+    def load(self, crawl_id):
+        """Visited URLs, emails and the highest sequence number of a saved crawl"""
+        visited = {row[0] for row in self.db.execute('SELECT url FROM visited WHERE crawl_id = ?', (crawl_id,))}
+        emails = {row[0] for row in self.db.execute('SELECT email FROM emails WHERE crawl_id = ?', (crawl_id,))}
+        max_seq = self.db.execute('SELECT COALESCE(MAX(seq), 0) FROM frontier WHERE crawl_id = ?', (crawl_id,)).fetchone()[0]
+        # Everything still pending goes back to disk and is paged in by priority
+        cursor = self.db.execute('UPDATE frontier SET spilled = 1 WHERE crawl_id = ?', (crawl_id,))
+        self._spilled[crawl_id] = cursor.rowcount
+        self.db.commit()
+        return visited, emails, max_seq
+
+    def add_frontier(self, crawl_id, key, url, score, seq, depth, spilled=False):
+        """Queue a URL unless its key is already in the frontier or visited; returns whether it was new"""
+        # A visited page keeps its frontier row until the flush that records it, so both checks hold
+        if self.db.execute('SELECT 1 FROM visited WHERE crawl_id = ? AND key = ?', (crawl_id, key)).fetchone():
+            return False
+        cursor = self.db.execute(
+            'INSERT OR IGNORE INTO frontier VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (crawl_id, key, url, score, seq, depth, int(spilled))
+        )
+        if not cursor.rowcount:
+            return False
+        self._uncommitted += 1
+        if spilled:
+            self._spilled[crawl_id] = self._spilled.get(crawl_id, 0) + 1
+        self.maybe_flush()
+        return True
+
+    def complete_page(self, crawl_id, key, url, new_emails=(), source_url=None):
+        """Record a finished page: it leaves the frontier and joins the visited set"""
+        self._visited.append((crawl_id, key, url))
+        self.add_emails(crawl_id, new_emails, source_url or url)
+
+    def add_emails(self, crawl_id, emails, source_url):
+        """Record emails of a page that stays in the frontier (e.g. its links were cut off)"""
+        self._emails.extend((crawl_id, email, source_url) for email in emails)
+        self.maybe_flush()
+
+    def take_spilled(self, crawl_id, limit):
+        """Move up to limit of the best spilled frontier entries back into memory"""
+        if not self._spilled.get(crawl_id):
+            return []
+        self.flush()
+        rows = self.db.execute(
+            'SELECT key, url, score, seq, depth FROM frontier '
+            'WHERE crawl_id = ? AND spilled = 1 ORDER BY score DESC, seq LIMIT ?',
+            (crawl_id, limit)
+        ).fetchall()
+        self.db.executemany(
+            'UPDATE frontier SET spilled = 0 WHERE crawl_id = ? AND key = ?',
+            [(crawl_id, row[0]) for row in rows]
+        )
+        self.db.commit()
+        # Spilled rows visited by an earlier session may have gone meanwhile
+        self._spilled[crawl_id] = self._spilled[crawl_id] - len(rows) if len(rows) == limit else 0
+        return rows
+
+    def has_pending(self, crawl_id):
+        """Whether any frontier entry, in memory or spilled, is still unvisited"""
+        self.flush()
+        return self.db.execute(
+            'SELECT 1 FROM frontier WHERE crawl_id = ? LIMIT 1', (crawl_id,)
+        ).fetchone() is not None
+
+    def finish_crawl(self, crawl_id, status):
+        self.flush()
+        self.db.execute('UPDATE crawls SET status = ?, updated_at = ? WHERE crawl_id = ?',
+                        (status, time.time(), crawl_id))
+        self.db.commit()
+
+    def maybe_flush(self):
+        pending = self._uncommitted + len(self._visited) + len(self._emails)
+        if pending >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write buffered operations in one transaction"""
+        self._last_flush = time.monotonic()
+        if not (self._uncommitted or self._visited or self._emails):
+            return
+        visited, emails = self._visited, self._emails
+        self._uncommitted, self._visited, self._emails = 0, [], []
+        # Also commits the frontier inserts made since the last flush
+        with self.db:
+            self.db.executemany('INSERT OR IGNORE INTO visited VALUES (?, ?, ?)', visited)
+            self.db.executemany('DELETE FROM frontier WHERE crawl_id = ? AND key = ?',
+                                [(crawl_id, key) for crawl_id, key, _ in visited])
+            self.db.executemany('INSERT OR IGNORE INTO emails VALUES (?, ?, ?)', emails)
+
+    def close(self):
+        if self.db:
+            self.flush()
+            self.db.close()
+            self.db = None
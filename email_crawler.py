@@ -0,0 +1,1474 @@
+"""Headless email crawl engine shared by the GUI and the command line"""
+import argparse
+import asyncio
+import contextlib
+import fnmatch
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import time
+import weakref
+from collections import namedtuple
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from html.parser import HTMLParser
+from urllib.parse import unquote_plus, urljoin, urlparse, urlunparse
+
+import aiohttp
+from bs4 import BeautifulSoup
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
+
+from crawl_metrics import CrawlMetrics, MetricsServer, PageSpan, profiled
+from crawl_state import CrawlStateStore
+from response_cache import ResponseCache
+from result_sinks import open_sink
+from site_discovery import discover_site_urls
+
+try:
+    import lxml.html
+    import lxml.etree
+except ImportError:  # lxml is optional; the streaming parser is used instead
+    lxml = None
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class BrowserPool:
+    """Long-lived Chromium instance handing out reusable contexts and pages"""
+
+    def __init__(self, size=5, max_uses=25, max_heap_mb=256, user_agent=USER_AGENT, setup_page=None,
+                 browser=None):
+        self.size = size
+        self.max_uses = max_uses  # Recycle a page after this many navigations
+        self.max_heap_mb = max_heap_mb  # Recycle a page whose JS heap grew past this
+        self.user_agent = user_agent
+        self.setup_page = setup_page  # Awaited with every new page, e.g. to install routes
+        self.playwright = None
+        # A browser shared with another stage (e.g. the Maps searches) is used but not closed
+        self.browser = browser
+        self.owns_browser = browser is None
+        self.closed = False
+        self._idle = []
+        self._uses = {}
+        self._crashed = set()
+        self._slots = None
+        self._lock = None
+        self._closing = None
+
+    async def start(self):
+        """Launch the browser once for the whole crawl"""
+        self._slots = asyncio.Semaphore(self.size)
+        self._lock = asyncio.Lock()
+        if self.owns_browser:
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch()
+        return self
+
+    async def _new_page(self):
+        context = await self.browser.new_context(user_agent=self.user_agent)
+        page = await context.new_page()
+        self._uses[page] = 0
+        page.on("crash", lambda p=page: self._crashed.add(p))
+        if self.setup_page:
+            await self.setup_page(page)
+        return page
+
+    async def acquire(self):
+        """Wait for a free slot and return an idle or freshly created page"""
+        await self._slots.acquire()
+        try:
+            async with self._lock:
+                if self.closed:
+                    raise RuntimeError("Browser pool is closed")
+                page = self._idle.pop() if self._idle else None
+            if page is None:
+                page = await self._new_page()
+            self._uses[page] += 1
+            return page
+        except:
+            self._slots.release()
+            raise
+
+    async def _needs_recycle(self, page):
+        if page in self._crashed or page.is_closed():
+            return True
+        if self._uses.get(page, 0) >= self.max_uses:
+            return True
+        try:
+            heap = await page.evaluate(
+                "performance.memory ? performance.memory.usedJSHeapSize : 0"
+            )
+            return heap > self.max_heap_mb * 1024 * 1024
+        except:
+            return True
+
+    async def _discard(self, page):
+        self._uses.pop(page, None)
+        self._crashed.discard(page)
+        try:
+            await page.context.close()
+        except:
+            pass
+
+    async def release(self, page, broken=False):
+        """Return a page to the pool, recycling it if it crashed or leaked memory"""
+        try:
+            if self.closed or broken or await self._needs_recycle(page):
+                await self._discard(page)
+                return
+            try:
+                # Drop the previous document so its memory is freed while idle
+                await page.goto("about:blank")
+            except:
+                await self._discard(page)
+                return
+            async with self._lock:
+                if self.closed:
+                    await self._discard(page)
+                else:
+                    self._idle.append(page)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        """Close every context and shut the browser down"""
+        # Concurrent callers (Stop button and crawl teardown) share one shutdown
+        if self._closing is None:
+            self.closed = True
+            self._closing = asyncio.ensure_future(self._shutdown())
+        await self._closing
+
+    async def _shutdown(self):
+        for page in list(self._uses):
+            await self._discard(page)
+        self._idle = []
+        try:
+            if self.browser and self.owns_browser:
+                await self.browser.close()
+        finally:
+            if self.playwright:
+                await self.playwright.stop()
+
+
+class ResourcePolicy:
+    """Block heavy resources and trackers in rendered pages and pick a readiness strategy"""
+
+    DEFAULT_BLOCKED_TYPES = ('image', 'media', 'font', 'stylesheet')
+    DEFAULT_BLOCKED_DOMAINS = (
+        'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com',
+        'googleadservices.com', 'adservice.google.com', 'facebook.net', 'connect.facebook.net',
+        'hotjar.com', 'clarity.ms', 'segment.com', 'segment.io', 'mixpanel.com', 'amplitude.com',
+        'fullstory.com', 'newrelic.com', 'nr-data.net', 'criteo.com', 'taboola.com', 'outbrain.com',
+        'scorecardresearch.com', 'quantserve.com', 'adsrvr.org', 'bing.com', 'linkedin.com',
+        'twitter.com', 'tiktok.com', 'intercom.io', 'hubspot.com', 'hs-analytics.net',
+    )
+    # Typical transfer sizes used to estimate the bytes a blocked request would have cost
+    ESTIMATED_BYTES = {
+        'image': 40000, 'media': 500000, 'font': 35000, 'stylesheet': 25000,
+        'script': 30000, 'xhr': 5000, 'fetch': 5000, 'other': 10000,
+    }
+
+    def __init__(self, blocked_types=DEFAULT_BLOCKED_TYPES, blocked_domains=DEFAULT_BLOCKED_DOMAINS,
+                 block_third_party=False, wait_until='domcontentloaded', settle_ms=750):
+        self.blocked_types = set(blocked_types)
+        self.blocked_domains = tuple(d.lower() for d in blocked_domains)
+        self.block_third_party = block_third_party
+        # 'networkidle' reproduces the old behaviour; 'domcontentloaded' or 'load'
+        # are followed by up to settle_ms of waiting for the network to go quiet
+        self.wait_until = wait_until
+        self.settle_ms = settle_ms
+        self.page_stats = weakref.WeakKeyDictionary()
+        self.stats = {'blocked': 0, 'bytes_saved': 0}
+
+    def is_blocked_domain(self, host):
+        return any(host == d or host.endswith('.' + d) for d in self.blocked_domains)
+
+    def should_block(self, request, page_url):
+        if request.is_navigation_request():
+            return False
+        if request.resource_type in self.blocked_types:
+            return True
+        host = (urlparse(request.url).hostname or '').lower()
+        if self.is_blocked_domain(host):
+            return True
+        if self.block_third_party:
+            site = site_host(urlparse(page_url).hostname)
+            return bool(site) and not (site_host(host) == site or host.endswith('.' + site))
+        return False
+
+    async def install(self, page):
+        """Route every sub-request of the page through the policy"""
+        page_stats = self.page_stats[page] = {'blocked': 0, 'bytes_saved': 0}
+
+        async def handle(route):
+            request = route.request
+            try:
+                blocked = self.should_block(request, page.url)
+            except Exception:
+                blocked = False
+            if blocked:
+                page_stats['blocked'] += 1
+                page_stats['bytes_saved'] += self.ESTIMATED_BYTES.get(request.resource_type, 10000)
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await page.route('**/*', handle)
+
+    async def goto(self, page, url, timeout=30000):
+        """Navigate and wait until the page is ready; returns the page's blocking stats"""
+        page_stats = self.page_stats.get(page, {'blocked': 0, 'bytes_saved': 0})
+        page_stats['blocked'] = page_stats['bytes_saved'] = 0
+
+        await page.goto(url, wait_until=self.wait_until, timeout=timeout)
+        if self.wait_until != 'networkidle' and self.settle_ms:
+            try:
+                await page.wait_for_load_state('networkidle', timeout=self.settle_ms)
+            except Exception:
+                pass  # Still busy after the settle period; use what has rendered
+
+        self.stats['blocked'] += page_stats['blocked']
+        self.stats['bytes_saved'] += page_stats['bytes_saved']
+        return dict(page_stats)
+
+
+# Result of a plain HTTP fetch; text is '' for non-HTML bodies and None on failure or 304
+StaticResponse = namedtuple('StaticResponse', 'status text etag last_modified')
+
+
+class TieredFetcher:
+    """Fetch pages with a pooled aiohttp GET and fall back to Playwright when needed"""
+
+    # Markers of single-page-app shells whose content only appears after rendering
+    JS_SHELL_ROOT = re.compile(r'id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>')
+    JS_SHELL_MARKERS = ('ng-app', 'data-reactroot', 'enable javascript', 'requires javascript')
+    TAG_AND_TEXT = re.compile(r'<(/?)([a-zA-Z][\w-]*)[^>]*>([^<]*)')
+    NON_VISIBLE_TAGS = ('script', 'style', 'noscript')
+    NOSCRIPT = re.compile(r'<noscript\b.*?</noscript>', re.IGNORECASE | re.DOTALL)
+    # Client errors a browser would get too; 403 is often a bot wall that rendering passes
+    FINAL_STATUSES = frozenset(range(400, 500)) - {403}
+
+    def __init__(self, concurrency=5, render_rules=None, timeout=15, min_text_length=200,
+                 browser_pool_factory=None, resource_policy=None):
+        self.concurrency = concurrency
+        # Regexes matched against the URL to force a browser render
+        self.render_rules = [re.compile(r, re.IGNORECASE) for r in (render_rules or [])]
+        self.timeout = timeout
+        self.min_text_length = min_text_length
+        self.resource_policy = resource_policy or ResourcePolicy()
+        self.browser_pool_factory = browser_pool_factory or (
+            lambda: BrowserPool(size=concurrency, setup_page=self.resource_policy.install)
+        )
+        self.browser_pool = None
+        self.session = None
+        self.stats = {'static': 0, 'browser': 0, 'skipped': 0, 'failed': 0}
+        self._pool_lock = None
+
+    async def start(self):
+        self._pool_lock = asyncio.Lock()
+        connector = aiohttp.TCPConnector(limit=self.concurrency * 2, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': USER_AGENT}
+        )
+        return self
+
+    async def get_browser_pool(self):
+        """Start the browser only once the first page needs rendering"""
+        async with self._pool_lock:
+            if self.browser_pool is None:
+                self.browser_pool = await self.browser_pool_factory().start()
+            return self.browser_pool
+
+    async def fetch_static_response(self, url, headers=None, span=None):
+        """Plain (optionally conditional) HTTP GET; returns a StaticResponse"""
+        try:
+            async with self.session.get(url, allow_redirects=True, headers=headers) as response:
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                if response.status == 304:
+                    return StaticResponse(304, None, etag, last_modified)
+                if response.status >= 400:
+                    return StaticResponse(response.status, None, etag, last_modified)
+                content_type = response.headers.get('Content-Type', '').lower()
+                if content_type and not ('html' in content_type or 'text' in content_type or 'xml' in content_type):
+                    return StaticResponse(response.status, '', etag, last_modified)
+                text = await response.text(errors='replace')
+                if span:
+                    span.bytes += len(text)
+                return StaticResponse(response.status, text, etag, last_modified)
+        except asyncio.TimeoutError:
+            logging.debug(f"Static fetch timed out for {url}")
+            if span:
+                span.timeouts += 1
+            return StaticResponse(None, None, None, None)
+        except Exception as e:
+            logging.debug(f"Static fetch failed for {url}: {str(e)}")
+            return StaticResponse(None, None, None, None)
+
+    async def fetch_static(self, url):
+        """Plain HTTP GET; returns the body text, '' for non-HTML, or None on failure"""
+        return (await self.fetch_static_response(url)).text
+
+    async def fetch_rendered(self, url, span=None):
+        """Render the page in a pooled browser page; returns the HTML or None"""
+        span = span or PageSpan(url)
+        with span.phase('browser_acquire'):
+            pool = await self.get_browser_pool()
+            page = await pool.acquire()
+        broken = False
+        try:
+            try:
+                with span.phase('navigation'):
+                    page_stats = await self.resource_policy.goto(page, url, timeout=30000)
+            except PlaywrightTimeoutError:
+                span.timeouts += 1
+                return None
+            except Exception:
+                return None
+            logging.info(f"Rendered {url}: blocked {page_stats['blocked']} requests, "
+                         f"~{page_stats['bytes_saved'] // 1024} KB saved")
+            with span.phase('content'):
+                content = await page.content()
+            span.bytes += len(content)
+            return content
+        except Exception as e:
+            broken = True
+            logging.error(f"Error rendering {url}: {str(e)}")
+            return None
+        finally:
+            await pool.release(page, broken=broken)
+
+    def has_visible_text(self, html):
+        """True once min_text_length characters of text outside scripts/styles are seen"""
+        seen = 0
+        hidden = None
+        for match in self.TAG_AND_TEXT.finditer(html):
+            closing, tag, text = match.groups()
+            tag = tag.lower()
+            if hidden:
+                if closing and tag == hidden:
+                    hidden = None
+                continue
+            if not closing and tag in self.NON_VISIBLE_TAGS:
+                hidden = tag
+                continue
+            seen += len(text.strip())
+            if seen >= self.min_text_length:
+                return True
+        return False
+
+    def looks_like_js_shell(self, html):
+        """Scripted page with (almost) no visible text, i.e. its content is built client-side"""
+        # Plain substring checks first; this runs on the event loop for every static page
+        lowered = html.lower()
+        markers = any(marker in lowered for marker in self.JS_SHELL_MARKERS)
+        if markers and '<noscript' in lowered:
+            # An "enable JavaScript" notice for script-less visitors says nothing about the page
+            markers = any(marker in self.NOSCRIPT.sub('', lowered) for marker in self.JS_SHELL_MARKERS)
+        if not (markers or '<script' in lowered or self.JS_SHELL_ROOT.search(lowered)):
+            return False
+        return not self.has_visible_text(html)
+
+    def needs_render(self, url, html, emails, urls):
+        """Decide whether the static HTML is good enough or the browser is needed"""
+        if any(rule.search(url) for rule in self.render_rules):
+            return True
+        if not emails and not urls:
+            return True
+        return self.looks_like_js_shell(html)
+
+    def record(self, tier):
+        self.stats[tier] += 1
+
+    def summary(self):
+        summary = ' | '.join(f"{tier}: {count}" for tier, count in self.stats.items())
+        blocked = self.resource_policy.stats
+        if blocked['blocked']:
+            summary += f" | blocked requests: {blocked['blocked']} (~{blocked['bytes_saved'] // 1024} KB saved)"
+        return summary
+
+    async def close(self):
+        if self.browser_pool:
+            await self.browser_pool.close()
+        if self.session:
+            await self.session.close()
+
+
+# Query parameters dropped during canonicalization; shell-style wildcards allowed
+DEFAULT_TRACKING_PARAMS = (
+    'utm_*', 'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', '_hsenc', '_hsmi', 'hsctatracking', 'igshid', 'ref_src',
+    'sessionid', 'phpsessid', 'jsessionid',
+)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def site_host(hostname):
+    """Host name used to decide whether two URLs belong to the same site"""
+    hostname = (hostname or '').lower()
+    return hostname[4:] if hostname.startswith('www.') else hostname
+
+
+def is_valid_url(url, base_url):
+    """Check if URL is valid and belongs to the same domain"""
+    try:
+        parsed = urlparse(url)
+        base_parsed = urlparse(base_url)
+        return site_host(parsed.hostname) == site_host(base_parsed.hostname) and parsed.scheme in ['http', 'https']
+    except:
+        return False
+
+
+def is_tracking_param(name, tracking_params=DEFAULT_TRACKING_PARAMS):
+    name = name.lower()
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in tracking_params)
+
+
+def canonicalize_url(url, tracking_params=DEFAULT_TRACKING_PARAMS):
+    """Normalise a URL for fetching: drop the fragment, tracking params and default port"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"  # IPv6 literal
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    return urlunparse((scheme, host, parsed.path or '/', parsed.params,
+                       '&'.join(query_fields(parsed.query, tracking_params)), ''))
+
+
+def query_fields(query, tracking_params=DEFAULT_TRACKING_PARAMS):
+    """The query's 'name=value' fields as sent, minus tracking params"""
+    # Fields keep their original encoding (and a valueless '?x' stays '?x')
+    return [field for field in query.split('&')
+            if field and not is_tracking_param(unquote_plus(field.partition('=')[0]), tracking_params)]
+
+
+def url_key(url, tracking_params=DEFAULT_TRACKING_PARAMS):
+    """Dedup key: the canonical URL with www., trailing slash and query order ignored"""
+    parsed = urlparse(canonicalize_url(url, tracking_params))
+    path = parsed.path.rstrip('/') or '/'
+    query = '&'.join(sorted(query_fields(parsed.query, ())))
+    return urlunparse((parsed.scheme, site_host(parsed.netloc), path, parsed.params, query, ''))
+
+
+# Email validation and extraction patterns, compiled once at import time
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+DIMENSIONS = re.compile(r'\d+x\d+')
+SCALE_MARKER = re.compile(r'@\d+x')
+INVALID_NAME_PATTERNS = re.compile(
+    r'-\d+x\d+'  # Dimension markers
+    r'|_\d+x\d+'  # Underscore dimensions
+    r'|[\w-]+shot'  # Screenshot/headshot
+    r'|head-shot'
+    r'|thumbnail'
+    r'|avatar'
+    r'|profile-pic'
+)
+EMAIL_SHAPE = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9._%+-]*@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+CONSECUTIVE_SPECIALS = re.compile(r'[._%+-]{2,}')
+COMMON_DOMAINS = ('.com', '.org', '.net', '.edu', '.gov', '.mil', '.biz', '.info')
+
+
+def is_valid_email(email):
+    """Enhanced email validation to filter out false positives"""
+    if len(email) > 254 or len(email) < 5:
+        return False
+
+    lowered = email.lower()
+
+    # Reject if contains common image extensions
+    if any(ext in lowered for ext in IMAGE_EXTENSIONS):
+        return False
+
+    # Reject if contains dimensions (like 768x960)
+    if DIMENSIONS.search(email):
+        return False
+
+    # Reject if contains @2x or similar scale markers
+    if SCALE_MARKER.search(email):
+        return False
+
+    # Check for common file naming patterns
+    if INVALID_NAME_PATTERNS.search(lowered):
+        return False
+
+    # Basic email pattern validation
+    if not EMAIL_SHAPE.match(email):
+        return False
+
+    # Additional checks for valid email
+    parts = email.split('@')
+    if len(parts) != 2:
+        return False
+
+    local_part, domain = parts
+
+    # Check domain part
+    if not all(part.isalnum() or part == '-' for part in domain.split('.')):
+        return False
+
+    # Check for consecutive special characters
+    if CONSECUTIVE_SPECIALS.search(local_part):
+        return False
+
+    # Check for common valid email domains (optional)
+    if not domain.lower().endswith(COMMON_DOMAINS):
+        # If not a common domain, be more strict
+        if len(domain) > 50:  # Unusually long domain
+            return False
+
+    return True
+
+
+EMAIL_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    # Standard email format
+    r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+
+    # Protected email formats
+    r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s*[\[\(]\s*at\s*[\]\)]\s*[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s+at\s+[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+
+    # Spaced email format
+    r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s*@\s*[A-Za-z0-9.-]+\s*\.\s*[A-Z|a-z]{2,}\b',
+)]
+EMAIL_CLEANUP = re.compile(r'\s+|\[at\]|\(at\)|\s*at\s*')
+
+# Every match of EMAIL_PATTERNS contains one of these separators
+EMAIL_ANCHORS = re.compile(r'@|[\[(]\s*at\s*[\])]|(?<=\s)at(?=\s)', re.IGNORECASE)
+# Upper bound of what can follow a separator: spaced domain, dot and TLD
+EMAIL_TAIL = re.compile(r'\s*[A-Za-z0-9.|-]*\s*\.?\s*[A-Za-z0-9.|-]*', re.IGNORECASE)
+# Characters of the local part; under IGNORECASE [A-Za-z] also matches these four
+LOCAL_PART_CHARS = frozenset(
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-\u0130\u0131\u017f\u212a'
+)
+
+
+def email_windows(text):
+    """Yield merged (start, end) spans that contain every possible email match"""
+    window_start = window_end = None
+    for anchor in EMAIL_ANCHORS.finditer(text):
+        # Every pattern needs a dot between the separator and the TLD
+        tail_end = EMAIL_TAIL.match(text, anchor.end()).end()
+        if text.find('.', anchor.end(), tail_end) == -1:
+            continue
+
+        # Walk back over the optional spacing and the local part
+        start = anchor.start()
+        while start > 0 and text[start - 1].isspace():
+            start -= 1
+        while start > 0 and text[start - 1] in LOCAL_PART_CHARS:
+            start -= 1
+        if start == anchor.start() or not text[start:anchor.start()].strip():
+            continue  # No local part, so no pattern can match here
+        # One extra character keeps \b at the end of the window exact
+        end = tail_end + 1
+
+        if window_start is not None and start <= window_end:
+            window_end = max(window_end, end)
+            continue
+        if window_start is not None:
+            yield window_start, window_end
+        window_start, window_end = start, end
+    if window_start is not None:
+        yield window_start, window_end
+
+
+def extract_emails_from_text(text):
+    """Extract emails using multiple regex patterns with improved filtering"""
+    # Only the windows around '@', '[at]' and ' at ' are scanned, which
+    # finds exactly what the full-text passes would find
+    emails = set()
+    for start, end in email_windows(text):
+        for pattern in EMAIL_PATTERNS:
+            for match in pattern.finditer(text, start, end):
+                # Clean and normalize email
+                clean_email = EMAIL_CLEANUP.sub('@', match.group())
+                clean_email = clean_email.strip().lower()
+                if is_valid_email(clean_email):
+                    emails.add(clean_email)
+    return emails
+
+
+def document_base_url(base_url, base_href):
+    """URL relative links resolve against: the page's <base href>, if it is usable"""
+    if not base_href:
+        return base_url
+    try:
+        return urljoin(base_url, base_href)
+    except ValueError:
+        return base_url
+
+
+def resolve_links(links, document_base, base_url):
+    """Resolve (href, anchor text) pairs to the absolute URLs on the crawled site"""
+    site = site_host(urlparse(base_url).hostname)
+    urls = {}
+    resolved = {}  # Menus repeat the same hrefs; resolve each one once
+    for href, text in links:
+        href = href.strip()
+        if href in resolved:
+            full_url = resolved[href]
+        else:
+            try:
+                # A malformed href (e.g. "http://[bad") only drops that link
+                full_url = urljoin(document_base, href)
+                parsed = urlparse(full_url)
+                if parsed.scheme not in ('http', 'https') or site_host(parsed.hostname) != site:
+                    full_url = None
+            except ValueError:
+                full_url = None
+            resolved[href] = full_url
+        if full_url and (text or full_url not in urls):
+            urls[full_url] = text
+    return urls
+
+
+def extract_urls_bs4(page_content, base_url):
+    """Original BeautifulSoup tree parse; slowest, kept for comparison"""
+    soup = BeautifulSoup(page_content, 'html.parser')
+    base = soup.find('base', href=True)
+    document_base = document_base_url(base_url, base['href'] if base else None)
+    links = (
+        (anchor['href'], anchor.get_text(' ', strip=True) or anchor.get('title') or anchor.get('aria-label') or '')
+        for anchor in soup.find_all('a', href=True)
+    )
+    return resolve_links(links, document_base, base_url)
+
+
+class LinkCollector(HTMLParser):
+    """Streaming tokenizer that only records <a href> and <base href>"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.base_href = None
+        self.links = []
+        self._anchor = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            attrs = dict(attrs)
+            if attrs.get('href') is not None:
+                fallback = attrs.get('title') or attrs.get('aria-label') or ''
+                self._anchor = [attrs['href'], [], fallback]
+                self.links.append(self._anchor)
+        elif tag == 'base' and self.base_href is None:
+            self.base_href = dict(attrs).get('href')
+
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self._anchor = None
+
+    def handle_data(self, data):
+        if self._anchor is not None:
+            self._anchor[1].append(data)
+
+
+def extract_urls_stream(page_content, base_url):
+    """Pure-Python streaming parse without building a document tree"""
+    collector = LinkCollector()
+    collector.feed(page_content)
+    collector.close()
+
+    document_base = document_base_url(base_url, collector.base_href)
+    links = (
+        (href, ' '.join(' '.join(parts).split()) or fallback)
+        for href, parts, fallback in collector.links
+    )
+    return resolve_links(links, document_base, base_url)
+
+
+def extract_urls_lxml(page_content, base_url):
+    """libxml2 HTML parse; the fastest backend when lxml is installed"""
+    # huge_tree lifts libxml2's nesting limit, which silently truncates
+    # badly nested pages; parsers are not shared between threads
+    parser = lxml.html.HTMLParser(huge_tree=True)
+    try:
+        try:
+            root = lxml.html.fromstring(page_content, parser=parser)
+        except ValueError:
+            # Strings carrying an XML encoding declaration must be parsed as bytes
+            root = lxml.html.fromstring(page_content.encode('utf-8'), parser=parser)
+    except lxml.etree.ParserError:
+        return {}
+
+    base = root.find('.//base[@href]')
+    document_base = document_base_url(base_url, base.get('href') if base is not None else None)
+    links = (
+        (anchor.get('href'),
+         ' '.join(anchor.text_content().split()) or anchor.get('title') or anchor.get('aria-label') or '')
+        for anchor in root.iter('a') if anchor.get('href') is not None
+    )
+    return resolve_links(links, document_base, base_url)
+
+
+LINK_BACKENDS = {
+    'bs4': extract_urls_bs4,
+    'stream': extract_urls_stream,
+}
+if lxml is not None:
+    LINK_BACKENDS['lxml'] = extract_urls_lxml
+
+
+def extract_urls_from_page(page_content, base_url, backend='auto'):
+    """Extract all URLs from page content, mapped to their anchor text"""
+    if backend == 'auto':
+        backend = 'lxml' if 'lxml' in LINK_BACKENDS else 'stream'
+    return LINK_BACKENDS[backend](page_content, base_url)
+
+
+def parse_content(content, url, link_backend='auto'):
+    """CPU-bound part of handling a page: returns (emails, links, phase timings)"""
+    started = time.perf_counter()
+    emails = extract_emails_from_text(content)
+    scanned = time.perf_counter()
+    links = extract_urls_from_page(content, url, link_backend)
+    timings = {'email_scan': scanned - started, 'link_extract': time.perf_counter() - scanned}
+    return emails, links, timings
+
+
+class ParsePool:
+    """Process pool for email scanning and link extraction, with bounded submissions"""
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        # Pages waiting for or inside a worker; further callers wait (backpressure)
+        self.max_pending = max_pending or self.workers * 2
+        self.executor = None
+        self._slots = None
+        self.stats = {'pages': 0, 'waits': 0}
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self.max_pending)
+        # Spawned workers don't inherit the GUI's threads or the event loop
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        return self
+
+    async def parse(self, content, url, link_backend='auto'):
+        if self._slots.locked():
+            self.stats['waits'] += 1
+        async with self._slots:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, parse_content, content, url, link_backend
+            )
+        self.stats['pages'] += 1
+        return result
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+class LoopMonitor:
+    """Measure how long the event loop is blocked by sampling its scheduling lag"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.blocked_seconds = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._sample())
+        return self
+
+    async def _sample(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            self.samples += 1
+            if lag > 0.005:  # Ignore ordinary scheduling jitter
+                self.blocked_seconds += lag
+                self.max_lag = max(self.max_lag, lag)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def summary(self):
+        return (f"event loop blocked {self.blocked_seconds:.2f}s in total, "
+                f"longest stall {self.max_lag * 1000:.0f} ms")
+
+
+# Columns of the streamed email records
+EMAIL_FIELDS = ('email', 'source_url', 'site', 'found_at')
+
+# Keyword weights for the crawl frontier; contact-like pages are fetched first
+DEFAULT_PRIORITY_KEYWORDS = {
+    'contact': 10, 'kontakt': 10, 'impressum': 8, 'imprint': 8,
+    'about': 6, 'team': 6, 'staff': 6, 'people': 5, 'leadership': 4,
+    'support': 3, 'office': 3, 'legal': 2, 'privacy': 1,
+}
+DEPTH_PENALTY = 2
+ASSET_PATH = re.compile(r'\.(?:pdf|zip|jpe?g|png|gif|svg|webp|mp4|mp3|docx?|xlsx?|pptx?)$', re.IGNORECASE)
+
+
+def score_link(url, anchor_text='', depth=0, keywords=None):
+    """Score a link for the priority frontier; higher scores are crawled first"""
+    keywords = DEFAULT_PRIORITY_KEYWORDS if keywords is None else keywords
+    parsed = urlparse(url)
+    target = f"{parsed.path} {parsed.query}".lower()
+    anchor_text = anchor_text.lower()
+
+    score = 0.0
+    for keyword, weight in keywords.items():
+        if keyword in target:
+            score += weight
+        if keyword in anchor_text:
+            score += weight / 2
+
+    # Prefer shallow pages and short paths, and push file downloads to the back
+    score -= depth * DEPTH_PENALTY
+    score -= parsed.path.rstrip('/').count('/') * 0.5
+    if ASSET_PATH.search(parsed.path):
+        score -= 20
+    return score
+
+
+class EmailCrawler:
+    """Crawl one site for email addresses without any GUI dependency"""
+
+    def __init__(self, base_url, max_pages=50, concurrent_tasks=5, fetcher=None,
+                 render_rules=None, crawl_mode='workers', priority_keywords=None,
+                 tracking_params=DEFAULT_TRACKING_PARAMS, link_backend='auto',
+                 resource_policy=None, parse_pool=None, parse_workers=0, cache=None,
+                 skip_unchanged=False, state=None, resume=False, max_frontier=10000,
+                 sink=None, metrics=None, use_sitemaps=True, on_progress=None, on_emails=None):
+        self.base_url = base_url
+        self.max_pages = max_pages
+        self.concurrent_tasks = concurrent_tasks
+        self.render_rules = render_rules or []  # URL regexes that always need a browser render
+        self.crawl_mode = crawl_mode  # 'workers' (continuous pool) or 'batch' (legacy gather loop)
+        # Keyword -> weight used to score links; a plain list gives every keyword the same weight
+        if isinstance(priority_keywords, (list, tuple, set)):
+            priority_keywords = {keyword.lower(): 5 for keyword in priority_keywords}
+        self.priority_keywords = priority_keywords
+        self.tracking_params = tuple(p.lower() for p in tracking_params)
+        self.link_backend = link_backend  # 'auto', 'lxml', 'stream' or 'bs4'
+        self.resource_policy = resource_policy  # Blocking/readiness rules for rendered pages
+        # Shared process pool for parsing; a standalone crawl creates its own
+        # when parse_workers > 0, otherwise parsing stays in this process
+        self.parse_pool = parse_pool
+        self.parse_workers = parse_workers
+        self.loop_monitor = None
+        self.cache = cache  # Opened ResponseCache shared with other crawls, or None
+        self.skip_unchanged = skip_unchanged  # Reuse stored results for unchanged pages
+        # Opened CrawlStateStore for checkpoints; with one, frontier entries
+        # beyond max_frontier wait on disk instead of in memory
+        self.state = state
+        self.resume = resume
+        self.max_frontier = max_frontier
+        self.crawl_id = None
+        self.on_progress = on_progress  # Called as on_progress(crawler) after each claimed page
+        self.use_sitemaps = use_sitemaps  # Seed the frontier from robots.txt/sitemaps first
+        self.metrics = metrics  # CrawlMetrics fed with one PageSpan per fetched page
+        self.sink = sink  # ResultSink that gets one EMAIL_FIELDS record per new email
+        self.on_emails = on_emails  # Called as on_emails(crawler, new_emails, source_url)
+        self.fetcher = fetcher
+        self.owns_fetcher = fetcher is None
+        self.emails_found = set()
+        self.visited_urls = set()
+        self.seen_urls = set()  # url_key of everything ever enqueued (without a state store)
+        self.url_queue = queue.PriorityQueue()
+        self.should_stop = False
+        self.loop = None
+        self._sequence = itertools.count()
+
+    async def parse_page(self, content, url, span=None):
+        """Extract emails and links from fetched page content"""
+        span = span or PageSpan(url)
+        with span.phase('parse'):
+            if self.parse_pool:
+                emails, urls, timings = await self.parse_pool.parse(content, url, self.link_backend)
+                for name, seconds in timings.items():
+                    span.add(name, seconds)
+                return emails, urls
+
+            # Extract emails from visible content
+            with span.phase('email_scan'):
+                emails = extract_emails_from_text(content)
+            
+            # Extract links (with anchor text for frontier scoring) in a worker
+            # thread so large pages don't block the other in-flight fetches
+            with span.phase('link_extract'):
+                urls = await asyncio.get_running_loop().run_in_executor(
+                    None, partial(extract_urls_from_page, content, url, self.link_backend)
+                )
+            return emails, urls
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking call (cache disk I/O) in the default thread executor"""
+        return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args))
+
+    async def use_cached(self, entry, url, span):
+        """Emails and links of an unchanged page, re-extracted unless skip_unchanged is set"""
+        if self.skip_unchanged and entry.results is not None:
+            return set(entry.results['emails']), entry.results['links']
+        return await self.parse_page(entry.body, url, span)
+
+    async def store_in_cache(self, url, content, response, tier, emails, urls):
+        if self.cache and content:
+            results = {'emails': sorted(emails), 'links': urls}
+            etag = response.etag if response else None
+            last_modified = response.last_modified if response else None
+            await self.run_blocking(self.cache.put, url_key(url, self.tracking_params),
+                                    content, etag, last_modified, tier, results)
+
+    def record_tier(self, span, tier):
+        span.tier = tier
+        if tier != 'cache':
+            self.fetcher.record(tier)
+
+    async def extract_emails_from_page(self, url):
+        """Fetch and parse one page, timing each phase in a span fed to the metrics"""
+        span = PageSpan(url)
+        emails = set()
+        try:
+            emails, urls = await self.fetch_and_parse(url, span)
+            return emails, urls
+        except Exception as e:
+            self.record_tier(span, 'failed')
+            logging.error(f"Error extracting from {url}: {str(e)}")
+            return set(), {}
+        finally:
+            span.emails = len(emails)
+            span.finish()
+            if self.metrics:
+                self.metrics.record_page(span)
+
+    async def fetch_and_parse(self, url, span):
+        # Serve unchanged pages from the on-disk cache
+        entry = None
+        if self.cache:
+            with span.phase('cache_lookup'):
+                entry = await self.run_blocking(self.cache.get, url_key(url, self.tracking_params))
+            if entry and entry.is_fresh(self.cache.ttl):
+                self.cache.record('hits', entry.size)
+                self.record_tier(span, 'cache')
+                await self.run_blocking(self.cache.touch, entry.key)
+                return await self.use_cached(entry, url, span)
+
+        # Cheap static fetch first, conditional when we hold validators
+        with span.phase('static_fetch'):
+            response = await self.fetcher.fetch_static_response(
+                url, entry.validators() if entry else None, span
+            )
+        if response.status == 304 and entry:
+            self.cache.record('revalidated', entry.size)
+            self.record_tier(span, 'cache')
+            await self.run_blocking(self.cache.touch, entry.key, True)
+            return await self.use_cached(entry, url, span)
+        if self.cache:
+            self.cache.record('misses')
+
+        content = response.text
+        if content == '':
+            self.record_tier(span, 'skipped')
+            return set(), {}
+        if response.status in self.fetcher.FINAL_STATUSES:
+            # 404, 410 and the like: a browser would get the same answer
+            self.record_tier(span, 'failed')
+            return set(), {}
+        if content is not None:
+            emails, urls = await self.parse_page(content, url, span)
+            if not self.fetcher.needs_render(url, content, emails, urls):
+                self.record_tier(span, 'static')
+                await self.store_in_cache(url, content, response, 'static', emails, urls)
+                return emails, urls
+        
+        # Escalate to a full browser render for JavaScript pages
+        content = await self.fetcher.fetch_rendered(url, span)
+        if content is None:
+            self.record_tier(span, 'failed')
+            return set(), {}
+        self.record_tier(span, 'browser')
+        emails, urls = await self.parse_page(content, url, span)
+        # Rendered HTML is cached under the static response's validators
+        await self.store_in_cache(url, content, response, 'browser', emails, urls)
+        return emails, urls
+
+    def update_progress(self):
+        if self.on_progress:
+            self.on_progress(self)
+
+    def enqueue(self, url, anchor_text='', depth=0):
+        """Push a URL onto the frontier unless an equivalent URL was already seen"""
+        url = canonicalize_url(url, self.tracking_params)
+        key = url_key(url, self.tracking_params)
+        if not self.state:
+            if key in self.seen_urls:
+                return False
+            self.seen_urls.add(key)
+        score = score_link(url, anchor_text, depth, self.priority_keywords)
+        # The sequence number keeps equal scores in discovery order
+        seq = next(self._sequence)
+        spill = self.state is not None and self.url_queue.qsize() >= self.max_frontier
+        # Checkpointed crawls dedup on the store's keys, so memory stays bounded on huge sites
+        if self.state and not self.state.add_frontier(self.crawl_id, key, url, score, seq, depth, spilled=spill):
+            return False
+        if not spill:
+            self.url_queue.put_nowait((-score, seq, url, depth))
+        return True
+
+    def refill_frontier(self):
+        """Page spilled frontier entries back in, best first; returns how many"""
+        if not self.state or self.url_queue.qsize() >= self.max_frontier // 2:
+            return 0
+        rows = self.state.take_spilled(self.crawl_id, self.max_frontier - self.url_queue.qsize())
+        for _, url, score, seq, depth in rows:
+            self.url_queue.put_nowait((-score, seq, url, depth))
+        return len(rows)
+
+    def checkpoint_page(self, url, emails, complete=True):
+        """Persist a page's emails, and the page itself once all its links were enqueued"""
+        if not self.state:
+            return
+        if complete:
+            self.state.complete_page(self.crawl_id, url_key(url, self.tracking_params), url, emails)
+        else:
+            # The page stays in the frontier for a resume to revisit; its emails are
+            # restored with the rest, so they are not streamed a second time
+            self.state.add_emails(self.crawl_id, emails, url)
+
+    def handle_page_result(self, url, emails, new_urls):
+        """Record a page's emails and return its (link, anchor text) pairs"""
+        new_emails = emails - self.emails_found
+        self.emails_found.update(emails)
+        if new_emails and self.sink:
+            found_at = datetime.now().isoformat(timespec='seconds')
+            self.sink.write_many([
+                {'email': email, 'source_url': url, 'site': self.base_url, 'found_at': found_at}
+                for email in sorted(new_emails)
+            ])
+        if new_emails and self.on_emails:
+            self.on_emails(self, new_emails, url)
+        return list(new_urls.items())
+
+    async def run(self):
+        """Crawl the site and return the set of emails found"""
+        self.should_stop = False
+        self.visited_urls.clear()
+        self.emails_found.clear()
+        self.seen_urls.clear()
+        self.url_queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self.loop = asyncio.get_running_loop()
+
+        # Continue a checkpointed crawl, or start from the seed
+        resumed = False
+        if self.state:
+            self.crawl_id = url_key(self.base_url, self.tracking_params)
+            resumed = self.state.start_crawl(self.crawl_id, self.base_url, self.resume)
+        if resumed:
+            visited, emails, max_seq = self.state.load(self.crawl_id)
+            self.visited_urls.update(visited)
+            self.emails_found.update(emails)
+            self._sequence = itertools.count(max_seq + 1)
+            self.refill_frontier()
+            logging.info(f"Resuming {self.base_url}: {len(visited)} pages and {len(emails)} emails restored")
+        else:
+            self.enqueue(self.base_url)
+        
+        # Share one HTTP session and one lazily launched browser for the whole crawl
+        if self.owns_fetcher:
+            self.fetcher = TieredFetcher(
+                concurrency=self.concurrent_tasks,
+                render_rules=self.render_rules,
+                resource_policy=self.resource_policy
+            )
+            await self.fetcher.start()
+            self.loop_monitor = LoopMonitor().start()
+        owns_parse_pool = self.parse_pool is None and self.parse_workers > 0
+        if owns_parse_pool:
+            self.parse_pool = ParsePool(self.parse_workers).start()
+        try:
+            if self.use_sitemaps and not resumed:
+                await self.seed_from_sitemaps()
+            if self.crawl_mode == 'batch':
+                await self.crawl_batched(self.max_pages, self.concurrent_tasks)
+            else:
+                await self.crawl_workers(self.max_pages, self.concurrent_tasks)
+        finally:
+            if self.state:
+                # 'done' only once the frontier is exhausted; a page budget leaves it resumable
+                if self.should_stop:
+                    status = 'stopped'
+                elif not self.state.has_pending(self.crawl_id):
+                    status = 'done'
+                else:
+                    status = 'paused'
+                self.state.finish_crawl(self.crawl_id, status)
+            if owns_parse_pool:
+                self.parse_pool.close()
+                self.parse_pool = None
+            if self.owns_fetcher:
+                await self.loop_monitor.stop()
+                await self.fetcher.close()
+        return self.emails_found
+
+    async def seed_from_sitemaps(self):
+        """Enqueue the sitemap URLs that match priority keywords, best first, within the page budget"""
+        try:
+            urls = await discover_site_urls(self.fetcher.session, self.base_url)
+        except Exception as e:
+            logging.error(f"Sitemap discovery failed for {self.base_url}: {str(e)}")
+            return
+        candidates = []
+        for url in urls:
+            if not is_valid_url(url, self.base_url):
+                continue
+            score = score_link(url, '', 1, self.priority_keywords)
+            # Only pages a keyword points at; the rest are left to link crawling
+            if score > score_link(url, '', 1, {}):
+                candidates.append((score, url))
+        candidates.sort(key=lambda candidate: -candidate[0])
+        seeded = sum(self.enqueue(url, '', 1) for _, url in candidates[:self.max_pages])
+        if seeded:
+            logging.info(f"Seeded {seeded} of {len(urls)} sitemap URLs for {self.base_url}")
+
+    def stop(self):
+        """Ask the crawl to stop; safe to call from any thread"""
+        self.should_stop = True
+        
+        # Close our own browser pool on the crawl's loop, aborting in-flight pages
+        pool = self.fetcher.browser_pool if self.fetcher and self.owns_fetcher else None
+        if pool and self.loop and not self.loop.is_closed():
+            try:
+                asyncio.run_coroutine_threadsafe(pool.close(), self.loop)
+            except RuntimeError:
+                pass
+
+    async def crawl_workers(self, max_pages, concurrent_tasks):
+        """Continuous crawl: N long-running workers pull from a shared frontier"""
+        frontier = asyncio.PriorityQueue()
+        while not self.url_queue.empty():
+            frontier.put_nowait(self.url_queue.get())
+        self.url_queue = frontier
+
+        async def worker():
+            while True:
+                _, _, url, depth = await frontier.get()
+                try:
+                    # Once stopped or out of budget, leave the rest of the frontier (and the disk) alone
+                    if self.should_stop or len(self.visited_urls) >= max_pages:
+                        return
+                    self.refill_frontier()
+                    # Claim the page before fetching so max_pages is never exceeded
+                    if url in self.visited_urls:
+                        continue
+                    self.visited_urls.add(url)
+                    self.update_progress()
+                    
+                    emails, new_urls = await self.extract_emails_from_page(url)
+                    truncated = False
+                    for new_url, anchor_text in self.handle_page_result(url, emails, new_urls):
+                        if self.should_stop or len(self.visited_urls) >= max_pages:
+                            truncated = True
+                            break
+                        self.enqueue(new_url, anchor_text, depth + 1)
+                    self.checkpoint_page(url, emails, complete=not truncated)
+                except Exception as e:
+                    logging.error(f"Worker error on {url}: {str(e)}")
+                finally:
+                    frontier.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrent_tasks)]
+        stopped = asyncio.gather(*workers, return_exceptions=True)
+        try:
+            # The in-memory queue can drain while entries still wait on disk;
+            # workers quit instead once the budget is spent or Stop was pressed
+            while True:
+                drained = asyncio.ensure_future(frontier.join())
+                await asyncio.wait([drained, stopped], return_when=asyncio.FIRST_COMPLETED)
+                drained.cancel()
+                if stopped.done() or self.should_stop or len(self.visited_urls) >= max_pages:
+                    break
+                if not self.refill_frontier():
+                    break
+        finally:
+            for task in workers:
+                task.cancel()
+            await stopped
+        self.update_progress()
+
+    async def crawl_batched(self, max_pages, concurrent_tasks):
+        """Legacy crawl: fetch a batch, wait for all of it, then start the next"""
+        while len(self.visited_urls) < max_pages and not self.should_stop:
+            self.refill_frontier()
+            if self.url_queue.empty():
+                break
+            # Process multiple URLs concurrently
+            tasks = []
+            batch = []
+            for _ in range(min(concurrent_tasks, max_pages - len(self.visited_urls))):
+                if self.url_queue.empty() or self.should_stop:
+                    break
+                _, _, current_url, depth = self.url_queue.get()
+                if current_url not in self.visited_urls:
+                    self.visited_urls.add(current_url)
+                    batch.append((current_url, depth))
+                    tasks.append(self.extract_emails_from_page(current_url))
+            
+            if not tasks:
+                break
+                
+            # Update progress
+            self.update_progress()
+            
+            # Process batch of URLs
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            
+            for (url, depth), result in zip(batch, results):
+                if not isinstance(result, tuple):
+                    continue
+                emails, new_urls = result
+                # Add new URLs to queue
+                truncated = False
+                for new_url, anchor_text in self.handle_page_result(url, emails, new_urls):
+                    if self.should_stop or len(self.visited_urls) >= max_pages:
+                        truncated = True
+                        break
+                    self.enqueue(new_url, anchor_text, depth + 1)
+                self.checkpoint_page(url, emails, complete=not truncated)
+
+
+async def crawl_sites(seed_urls, max_pages=50, concurrent_tasks=5, max_sites=4, render_rules=None,
+                      crawl_mode='workers', priority_keywords=None,
+                      tracking_params=DEFAULT_TRACKING_PARAMS, link_backend='auto',
+                      resource_policy=None, parse_workers=0, loop_monitor=None, cache=None,
+                      skip_unchanged=False, state=None, resume=False, sink=None, metrics=None,
+                      use_sitemaps=True, on_site_done=None, on_progress=None, on_emails=None):
+    """Crawl several sites concurrently, sharing one HTTP session and one browser"""
+    fetcher = TieredFetcher(
+        concurrency=concurrent_tasks * max_sites,
+        render_rules=render_rules,
+        resource_policy=resource_policy
+    )
+    await fetcher.start()
+    parse_pool = ParsePool(parse_workers).start() if parse_workers else None
+    if loop_monitor:
+        loop_monitor.start()
+    site_slots = asyncio.Semaphore(max_sites)
+    results = {}
+
+    async def crawl_site(url):
+        if resume and state and state.status(url_key(url, tracking_params)) == 'done':
+            logging.info(f"Skipping {url}: already completed before the resume")
+            return
+        async with site_slots:
+            crawler = EmailCrawler(
+                url,
+                max_pages=max_pages,
+                concurrent_tasks=concurrent_tasks,
+                fetcher=fetcher,
+                crawl_mode=crawl_mode,
+                priority_keywords=priority_keywords,
+                tracking_params=tracking_params,
+                link_backend=link_backend,
+                parse_pool=parse_pool,
+                cache=cache,
+                skip_unchanged=skip_unchanged,
+                state=state,
+                resume=resume,
+                sink=sink,
+                metrics=metrics,
+                use_sitemaps=use_sitemaps,
+                on_progress=on_progress,
+                on_emails=on_emails
+            )
+            try:
+                await crawler.run()
+            except Exception as e:
+                logging.error(f"Error crawling {url}: {str(e)}")
+            results[url] = crawler
+            if on_site_done:
+                on_site_done(crawler)
+
+    try:
+        await asyncio.gather(*(crawl_site(url) for url in seed_urls))
+    finally:
+        if loop_monitor:
+            await loop_monitor.stop()
+        await fetcher.close()
+        if parse_pool:
+            parse_pool.close()
+    return results
+
+
+def read_seed_urls(source):
+    """Read one seed URL per line, skipping blanks and # comments"""
+    urls = []
+    for line in source:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if not urlparse(line).scheme:
+            line = f"https://{line}"
+        urls.append(line)
+    return urls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl websites for email addresses without the GUI")
+    parser.add_argument('seeds', nargs='?', default='-', help="File with one seed URL per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="JSON lines output file ('-' for stdout)")
+    parser.add_argument('--max-pages', type=int, default=50, help="Page budget per site")
+    parser.add_argument('--concurrency', type=int, default=5, help="Concurrent pages per site")
+    parser.add_argument('--sites', type=int, default=4, help="Sites crawled in parallel")
+    parser.add_argument('--mode', choices=['workers', 'batch'], default='workers', help="Crawl engine")
+    parser.add_argument('--render-rule', action='append', default=[], help="URL regex that always needs a browser render")
+    parser.add_argument('--keyword', action='append', default=[],
+                        help="Extra priority keyword as WORD or WORD=WEIGHT (crawled earlier)")
+    parser.add_argument('--strip-param', action='append', default=[],
+                        help="Extra query parameter (wildcards allowed) stripped from URLs before dedup")
+    parser.add_argument('--link-parser', choices=['auto'] + sorted(LINK_BACKENDS), default='auto',
+                        help="Link extraction backend")
+    parser.add_argument('--wait-until', choices=['domcontentloaded', 'load', 'networkidle'],
+                        default='domcontentloaded', help="Readiness event for rendered pages")
+    parser.add_argument('--settle-ms', type=int, default=750,
+                        help="Extra wait for the network to go quiet after --wait-until")
+    parser.add_argument('--block-third-party', action='store_true',
+                        help="Abort every third-party request in rendered pages, not just trackers")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="Processes for email/link parsing (0 parses in the crawl process)")
+    parser.add_argument('--cache-dir', help="Directory for the on-disk page cache (disabled if omitted)")
+    parser.add_argument('--cache-ttl', type=float, default=168,
+                        help="Hours a cached page is used before it is revalidated")
+    parser.add_argument('--cache-size-mb', type=int, default=512, help="Cache size limit (LRU eviction)")
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help="Reuse stored emails/links for unchanged pages instead of re-extracting")
+    parser.add_argument('--state-db', help="SQLite file for crawl checkpoints (frontier, visited pages, emails)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue the crawls saved in --state-db instead of starting over")
+    parser.add_argument('--stream', metavar='FILE',
+                        help="Append every email as it is found (.jsonl, .csv or .sqlite by extension)")
+    parser.add_argument('--no-sitemaps', action='store_true',
+                        help="Skip robots.txt/sitemap discovery and only follow links")
+    parser.add_argument('--metrics-port', type=int,
+                        help="Serve live Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-json', metavar='FILE', help="Write a JSON metrics summary at the end of the run")
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'], help="Profile the whole crawl")
+    parser.add_argument('--profile-output', default='crawl.prof',
+                        help="Profile output (pstats file for cprofile, HTML for pyinstrument)")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.seeds == '-':
+        seed_urls = read_seed_urls(sys.stdin)
+    else:
+        with open(args.seeds, encoding='utf-8') as f:
+            seed_urls = read_seed_urls(f)
+    if not seed_urls:
+        parser.error("no seed URLs given")
+    if args.resume and not args.state_db:
+        parser.error("--resume needs --state-db")
+
+    priority_keywords = None
+    if args.keyword:
+        priority_keywords = dict(DEFAULT_PRIORITY_KEYWORDS)
+        for item in args.keyword:
+            keyword, _, weight = item.partition('=')
+            priority_keywords[keyword.lower()] = float(weight) if weight else 5
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+
+    def on_site_done(crawler):
+        out.write(json.dumps({
+            'url': crawler.base_url,
+            'pages_crawled': len(crawler.visited_urls),
+            'emails': sorted(crawler.emails_found)
+        }) + "\n")
+        out.flush()
+        logging.info(f"Finished {crawler.base_url}: {len(crawler.emails_found)} emails")
+
+    loop_monitor = LoopMonitor()
+    cache = None
+    if args.cache_dir:
+        cache = ResponseCache(
+            args.cache_dir,
+            ttl=args.cache_ttl * 3600,
+            max_bytes=args.cache_size_mb * 1024 * 1024
+        ).open()
+    state = CrawlStateStore(args.state_db).open() if args.state_db else None
+    sink = open_sink(args.stream, EMAIL_FIELDS) if args.stream else None
+    metrics = CrawlMetrics()
+    metrics_server = MetricsServer(metrics, args.metrics_port).start() if args.metrics_port else None
+    profile = profiled(args.profile, args.profile_output) if args.profile else contextlib.nullcontext()
+    try:
+        with profile:
+            asyncio.run(crawl_sites(
+                seed_urls,
+                max_pages=args.max_pages,
+                concurrent_tasks=args.concurrency,
+                max_sites=args.sites,
+                render_rules=args.render_rule,
+                crawl_mode=args.mode,
+                priority_keywords=priority_keywords,
+                tracking_params=DEFAULT_TRACKING_PARAMS + tuple(args.strip_param),
+                link_backend=args.link_parser,
+                parse_workers=args.parse_workers,
+                loop_monitor=loop_monitor,
+                cache=cache,
+                skip_unchanged=args.skip_unchanged,
+                state=state,
+                resume=args.resume,
+                sink=sink,
+                metrics=metrics,
+                use_sitemaps=not args.no_sitemaps,
+                resource_policy=ResourcePolicy(
+                    block_third_party=args.block_third_party,
+                    wait_until=args.wait_until,
+                    settle_ms=args.settle_ms
+                ),
+                on_site_done=on_site_done
+            ))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache:
+            cache.close()
+        if state:
+            state.close()
+        if sink:
+            sink.close()
+        if metrics_server:
+            metrics_server.close()
+    if args.metrics_json:
+        with open(args.metrics_json, 'w', encoding='utf-8') as f:
+            json.dump(metrics.as_dict(), f, indent=2)
+    if cache:
+        print(f"Cache: {cache.summary()}", file=sys.stderr)
+    print(f"Parsing in {args.parse_workers or 'no'} worker processes: {loop_monitor.summary()}", file=sys.stderr)
+    print(f"Pages: {metrics.summary()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # Run through the importable module so functions pickled for the
+    # parse pool resolve as email_crawler.*, not __main__.*
+    import email_crawler
+    email_crawler.main()
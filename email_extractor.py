@@ -1,18 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog
 import asyncio
-from playwright.async_api import async_playwright
-import re
-import logging
-from urllib.parse import urljoin, urlparse
-import aiohttp
-from bs4 import BeautifulSoup
+import os
 import threading
-import queue
 from datetime import datetime
-import concurrent.futures
-import asyncio
-from functools import partial
+
+from email_crawler import EmailCrawler, DEFAULT_PRIORITY_KEYWORDS, EMAIL_FIELDS
+from crawl_metrics import CrawlMetrics
+from crawl_state import CrawlStateStore
+from response_cache import ResponseCache
+from result_sinks import open_sink
+from results_view import UiUpdater, VirtualList
 
 class EmailExtractorGUI:
     def __init__(self, root):
@@ -27,13 +25,29 @@ class EmailExtractorGUI:
         self.style.configure("Red.TButton", background="red")
         
         self.setup_ui()
+        self.updater = UiUpdater(root)  # Crawl-thread updates are applied once per frame
         self.emails_found = set()
         self.processing = False
         self.visited_urls = set()
-        self.url_queue = queue.Queue()
         self.max_pages = 50
         self.should_stop = False
         self.concurrent_tasks = 5  # Number of concurrent pages to process
+        self.render_rules = []  # URL regexes that always need a browser render
+        self.crawl_mode = 'workers'  # 'workers' (continuous pool) or 'batch' (legacy gather loop)
+        self.priority_keywords = None  # Extra frontier keywords on top of the defaults
+        self.parse_workers = 0  # Processes for email/link parsing; 0 parses in the crawl thread
+        # Pages are cached between runs (unless "Use page cache" is unticked) and revalidated after a week
+        self.cache_dir = os.path.join(os.path.expanduser('~'), '.email_extractor_cache')
+        self.use_cache = True  # Mirrors the checkbox for the crawl thread
+        self.skip_unchanged = False  # Reuse stored results for unchanged pages
+        # Crawl checkpoints, so a stopped or interrupted crawl can be resumed
+        self.state_path = os.path.join(os.path.expanduser('~'), '.email_extractor_state.sqlite')
+        self.resume = False
+        self.state = None
+        self.sink = None  # Streams each email to the file in the "Stream To" box
+        self.cache = None
+        self.metrics = None  # Per-page timings of the current run
+        self.crawler = None
         
     def setup_ui(self):
         # Main container
@@ -51,6 +65,14 @@ class EmailExtractorGUI:
         self.url_entry = ttk.Entry(url_frame, width=50)
         self.url_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         
+        # Optional streaming output
+        stream_frame = ttk.Frame(top_frame)
+        stream_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(stream_frame, text="Stream To:", style="Modern.TLabel").pack(side=tk.LEFT)
+        self.stream_entry = ttk.Entry(stream_frame, width=50)
+        self.stream_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        ttk.Button(stream_frame, text="Browse...", command=self.choose_stream_file).pack(side=tk.LEFT)
+        
         # Controls frame
         controls_frame = ttk.Frame(top_frame)
         controls_frame.pack(fill=tk.X, pady=5)
@@ -67,7 +89,19 @@ class EmailExtractorGUI:
         ttk.Label(left_controls, text="Concurrent Tasks:", style="Modern.TLabel").pack(side=tk.LEFT, padx=5)
         self.concurrent_entry = ttk.Entry(left_controls, width=5)
         self.concurrent_entry.insert(0, "5")
-        self.concurrent_entry.pack(side=tk.LEFT)
+        self.concurrent_entry.pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Label(left_controls, text="Priority Keywords:", style="Modern.TLabel").pack(side=tk.LEFT, padx=5)
+        self.keywords_entry = ttk.Entry(left_controls, width=20)
+        self.keywords_entry.pack(side=tk.LEFT)
+        
+        self.cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            left_controls,
+            text="Use page cache",
+            variable=self.cache_var
+        ).pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Button(left_controls, text="Clear Cache", command=self.clear_cache).pack(side=tk.LEFT)
         
         # Right controls
         right_controls = ttk.Frame(controls_frame)
@@ -81,6 +115,14 @@ class EmailExtractorGUI:
         )
         self.extract_btn.pack(side=tk.LEFT, padx=5)
         
+        self.resume_btn = ttk.Button(
+            right_controls,
+            text="Resume",
+            style="Modern.TButton",
+            command=self.resume_extraction
+        )
+        self.resume_btn.pack(side=tk.LEFT, padx=5)
+        
         self.stop_btn = ttk.Button(
             right_controls,
             text="Stop",
@@ -131,207 +173,30 @@ class EmailExtractorGUI:
         results_frame = ttk.LabelFrame(main_container, text="Results", padding="10")
         results_frame.pack(fill=tk.BOTH, expand=True)
         
+        self.results_view = VirtualList(
+            results_frame,
+            columns=('email', 'source'),
+            headings=('Email', 'Found On'),
+            widths=(300, 600)
+        )
+        self.results_view.pack(fill=tk.BOTH, expand=True)
+        
+        # Messages and the final summary
         self.results_text = scrolledtext.ScrolledText(
             results_frame,
             wrap=tk.WORD,
             width=70,
-            height=20,
+            height=8,
             font=('Courier', 10)
         )
-        self.results_text.pack(fill=tk.BOTH, expand=True)
-
-    def is_valid_url(self, url, base_url):
-        """Check if URL is valid and belongs to the same domain"""
-        try:
-            parsed = urlparse(url)
-            base_parsed = urlparse(base_url)
-            return parsed.netloc == base_parsed.netloc and parsed.scheme in ['http', 'https']
-        except:
-            return False
-
-    def is_valid_email(self, email):
-        """Enhanced email validation to filter out false positives"""
-        if len(email) > 254 or len(email) < 5:
-            return False
-            
-        # Reject if contains common image extensions
-        image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-        if any(ext in email.lower() for ext in image_extensions):
-            return False
-            
-        # Reject if contains dimensions (like 768x960)
-        if re.search(r'\d+x\d+', email):
-            return False
-            
-        # Reject if contains @2x or similar scale markers
-        if re.search(r'@\d+x', email):
-            return False
-            
-        # Check for common file naming patterns
-        invalid_patterns = [
-            r'-\d+x\d+',  # Dimension markers
-            r'_\d+x\d+',  # Underscore dimensions
-            r'[\w-]+shot',  # Screenshot/headshot
-            r'head-shot',
-            r'thumbnail',
-            r'avatar',
-            r'profile-pic'
-        ]
-        
-        if any(re.search(pattern, email.lower()) for pattern in invalid_patterns):
-            return False
-        
-        # Basic email pattern validation
-        email_pattern = r'^[a-zA-Z0-9][a-zA-Z0-9._%+-]*@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_pattern, email):
-            return False
-            
-        # Additional checks for valid email
-        parts = email.split('@')
-        if len(parts) != 2:
-            return False
-            
-        local_part, domain = parts
-        
-        # Check domain part
-        if not all(part.isalnum() or part == '-' for part in domain.split('.')):
-            return False
-            
-        # Check for consecutive special characters
-        if re.search(r'[._%+-]{2,}', local_part):
-            return False
-            
-        # Check for common valid email domains (optional)
-        common_domains = ['.com', '.org', '.net', '.edu', '.gov', '.mil', '.biz', '.info']
-        if not any(domain.lower().endswith(d) for d in common_domains):
-            # If not a common domain, be more strict
-            if len(domain) > 50:  # Unusually long domain
-                return False
-        
-        return True
-
-    def extract_emails_from_text(self, text):
-        """Extract emails using multiple regex patterns with improved filtering"""
-        email_patterns = [
-            # Standard email format
-            r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            
-            # Protected email formats
-            r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s*[\[\(]\s*at\s*[\]\)]\s*[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s+at\s+[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            
-            # Spaced email format
-            r'\b[A-Za-z0-9][A-Za-z0-9._%+-]*\s*@\s*[A-Za-z0-9.-]+\s*\.\s*[A-Z|a-z]{2,}\b',
-        ]
-        
-        emails = set()
-        for pattern in email_patterns:
-            found = re.findall(pattern, text, re.IGNORECASE)
-            for email in found:
-                # Clean and normalize email
-                clean_email = re.sub(r'\s+|\[at\]|\(at\)|\s*at\s*', '@', email)
-                clean_email = clean_email.strip().lower()
-                if self.is_valid_email(clean_email):
-                    emails.add(clean_email)
-        return emails
-
-    async def extract_urls_from_page(self, page_content, base_url):
-        """Extract all URLs from page content"""
-        soup = BeautifulSoup(page_content, 'html.parser')
-        urls = set()
-        
-        for anchor in soup.find_all('a', href=True):
-            url = anchor['href']
-            full_url = urljoin(base_url, url)
-            if self.is_valid_url(full_url, base_url):
-                urls.add(full_url)
-        return urls
-
-    async def extract_emails_from_page(self, url):
-        try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch()
-                context = await browser.new_context(
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                )
-                page = await context.new_page()
-                
-                # Set timeout and handle navigation
-                try:
-                    await page.goto(url, wait_until="networkidle", timeout=30000)
-                except:
-                    await browser.close()
-                    return set(), set()
-                
-                # Get page content after JavaScript execution
-                content = await page.content()
-                
-                # Extract emails from visible content
-                emails = self.extract_emails_from_text(content)
-                
-                # Extract emails from page source
-                urls = await self.extract_urls_from_page(content, url)
-                
-                # Check for contact/about pages
-                priority_urls = {u for u in urls if any(x in u.lower() for x in ['contact', 'about', 'team', 'staff'])}
-                
-                # Add remaining URLs
-                urls = priority_urls | urls
-                
-                await browser.close()
-                return emails, urls
-                
-        except Exception as e:
-            logging.error(f"Error extracting from {url}: {str(e)}")
-            return set(), set()
-
-    async def process_url(self, base_url):
-        self.should_stop = False
-        self.visited_urls = set()
-        self.url_queue = queue.Queue()
-        self.url_queue.put(base_url)
-        self.emails_found = set()
-        
-        max_pages = int(self.max_pages_entry.get())
-        concurrent_tasks = int(self.concurrent_entry.get())
-        
-        self.progress_bar['maximum'] = max_pages
-        
-        while not self.url_queue.empty() and len(self.visited_urls) < max_pages and not self.should_stop:
-            # Process multiple URLs concurrently
-            tasks = []
-            for _ in range(min(concurrent_tasks, max_pages - len(self.visited_urls))):
-                if self.url_queue.empty() or self.should_stop:
-                    break
-                current_url = self.url_queue.get()
-                if current_url not in self.visited_urls:
-                    self.visited_urls.add(current_url)
-                    tasks.append(self.extract_emails_from_page(current_url))
-            
-            if not tasks:
-                break
-                
-            # Update progress
-            self.progress_bar['value'] = len(self.visited_urls)
-            self.stats_var.set(f"Pages: {len(self.visited_urls)} | Emails: {len(self.emails_found)}")
-            
-            # Process batch of URLs
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for emails, new_urls in (r for r in results if isinstance(r, tuple)):
-                self.emails_found.update(emails)
-                if emails:
-                    self.root.after(0, self.update_results, emails)
-                
-                # Add new URLs to queue
-                for url in new_urls:
-                    if url not in self.visited_urls:
-                        self.url_queue.put(url)
+        self.results_text.pack(fill=tk.X, pady=(10, 0))
 
     def stop_extraction(self):
         self.should_stop = True
         self.progress_var.set("Stopping...")
         self.stop_btn.state(['disabled'])
+        if self.crawler:
+            self.crawler.stop()
 
     def save_results(self):
         if not self.emails_found:
@@ -353,7 +218,37 @@ class EmailExtractorGUI:
                 for email in sorted(self.emails_found):
                     f.write(f"{email}\n")
 
-    def start_extraction(self):
+    def choose_stream_file(self):
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".jsonl",
+            filetypes=[("JSON lines", "*.jsonl"), ("CSV files", "*.csv"), ("SQLite database", "*.sqlite")],
+            initialfile=f"emails_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        )
+        if filename:
+            self.stream_entry.delete(0, tk.END)
+            self.stream_entry.insert(0, filename)
+
+    def clear_cache(self):
+        if self.processing:
+            self.results_text.insert(tk.END, "Stop the extraction before clearing the cache\n")
+            return
+        if not os.path.isdir(self.cache_dir):
+            self.results_text.insert(tk.END, "Cache is already empty\n")
+            return
+        try:
+            cache = ResponseCache(self.cache_dir).open()
+            try:
+                cache.clear()
+            finally:
+                cache.close()
+            self.results_text.insert(tk.END, "Cache cleared\n")
+        except Exception as e:
+            self.results_text.insert(tk.END, f"Error clearing cache: {str(e)}\n")
+
+    def resume_extraction(self):
+        self.start_extraction(resume=True)
+
+    def start_extraction(self, resume=False):
         if self.processing:
             return
             
@@ -362,38 +257,109 @@ class EmailExtractorGUI:
             self.results_text.insert(tk.END, "Please enter a valid URL\n")
             return
             
+        self.max_pages = int(self.max_pages_entry.get())
+        self.concurrent_tasks = int(self.concurrent_entry.get())
+        extra_keywords = [k.strip().lower() for k in self.keywords_entry.get().split(',') if k.strip()]
+        self.priority_keywords = None
+        if extra_keywords:
+            self.priority_keywords = dict(DEFAULT_PRIORITY_KEYWORDS)
+            self.priority_keywords.update({keyword: 8 for keyword in extra_keywords})
+        
         self.processing = True
+        self.should_stop = False
+        self.resume = resume
+        self.use_cache = self.cache_var.get()
+        self.progress_bar['maximum'] = self.max_pages
         self.progress_bar['value'] = 0
         self.extract_btn.state(['disabled'])
+        self.resume_btn.state(['disabled'])
         self.stop_btn.state(['!disabled'])
         self.results_text.delete(1.0, tk.END)
+        self.results_view.clear()
         
         threading.Thread(target=self.run_extraction, args=(url,), daemon=True).start()
 
     def run_extraction(self, url):
-        asyncio.run(self.process_url(url))
-        self.root.after(0, self.finish_processing)
+        self.cache = self.state = self.sink = self.metrics = self.crawler = None
+        self.emails_found = set()
+        self.visited_urls = set()
+        try:
+            # Opening can fail on a bad path; finish_processing must still run to re-enable the buttons
+            self.cache = ResponseCache(self.cache_dir).open() if self.use_cache and self.cache_dir else None
+            self.state = CrawlStateStore(self.state_path).open() if self.state_path else None
+            stream_path = self.stream_entry.get().strip()
+            self.sink = open_sink(stream_path, EMAIL_FIELDS) if stream_path else None
+            self.metrics = CrawlMetrics()
+            self.crawler = EmailCrawler(
+                url,
+                max_pages=self.max_pages,
+                concurrent_tasks=self.concurrent_tasks,
+                render_rules=self.render_rules,
+                crawl_mode=self.crawl_mode,
+                priority_keywords=self.priority_keywords,
+                parse_workers=self.parse_workers,
+                cache=self.cache,
+                skip_unchanged=self.skip_unchanged,
+                state=self.state,
+                resume=self.resume,
+                sink=self.sink,
+                metrics=self.metrics,
+                on_progress=self.on_crawl_progress,
+                on_emails=self.on_crawl_emails
+            )
+            # The GUI shares the crawler's live result sets
+            self.emails_found = self.crawler.emails_found
+            self.visited_urls = self.crawler.visited_urls
+            asyncio.run(self.crawler.run())
+        except Exception as e:
+            self.updater.call(self.results_text.insert, tk.END, f"Error: {str(e)}\n")
+        finally:
+            if self.cache:
+                self.cache.close()
+            if self.state:
+                self.state.close()
+            if self.sink:
+                self.sink.close()
+            self.updater.call(self.finish_processing)
+
+    def on_crawl_progress(self, crawler):
+        """Called from the crawl thread; only the newest counts reach the Tk loop"""
+        pages, emails = len(crawler.visited_urls), len(crawler.emails_found)
+        rate = self.metrics.pages_per_second() if self.metrics else 0.0
+        self.updater.set_latest('progress', self.update_progress, pages, emails, rate)
+
+    def on_crawl_emails(self, crawler, new_emails, source_url):
+        self.updater.add_rows(self.results_view, [(email, source_url) for email in sorted(new_emails)])
 
-    def update_results(self, new_emails):
-        self.results_text.insert(tk.END, f"Found {len(new_emails)} new email(s):\n")
-        for email in sorted(new_emails):
-            self.results_text.insert(tk.END, f"• {email}\n")
-        self.results_text.see(tk.END)
+    def update_progress(self, pages, emails, rate=0.0):
+        self.progress_bar['value'] = pages
+        self.stats_var.set(f"Pages: {pages} | Emails: {emails} | {rate:.1f} pages/s")
 
     def finish_processing(self):
         self.processing = False
         self.progress_bar['value'] = self.progress_bar['maximum']
         self.progress_var.set(f"Completed! Total emails found: {len(self.emails_found)}")
         self.extract_btn.state(['!disabled'])
+        self.resume_btn.state(['!disabled'])
         self.stop_btn.state(['disabled'])
         
         # Show final summary
         self.results_text.insert(tk.END, "\n=== Final Summary ===\n")
         self.results_text.insert(tk.END, f"Pages crawled: {len(self.visited_urls)}\n")
         self.results_text.insert(tk.END, f"Total unique emails found: {len(self.emails_found)}\n")
+        if self.crawler and self.crawler.fetcher:
+            self.results_text.insert(tk.END, f"Fetch tiers: {self.crawler.fetcher.summary()}\n")
+        if self.cache:
+            self.results_text.insert(tk.END, f"Cache: {self.cache.summary()}\n")
+        if self.sink:
+            self.results_text.insert(tk.END, f"Streamed {self.sink.count} email(s) to {self.sink.path}\n")
+        if self.metrics:
+            self.results_text.insert(tk.END, f"Timing: {self.metrics.summary()}\n")
+        if self.crawler and self.crawler.loop_monitor:
+            self.results_text.insert(tk.END, f"Crawl loop: {self.crawler.loop_monitor.summary()}\n")
         
         if self.should_stop:
-            self.results_text.insert(tk.END, "Extraction was stopped by user\n")
+            self.results_text.insert(tk.END, "Extraction was stopped by user; press Resume to continue\n")
 
 def main():
     root = tk.Tk()
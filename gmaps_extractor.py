@@ -4,10 +4,18 @@ import json
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog
-import re
-import logging
-from urllib.parse import quote
-import threading
+
+from maps_scraper import (BUSINESS_FIELDS, CARD_SELECTOR, FEED_SELECTOR, CommandLoop, DetailEnricher,
+                          ResponseCapture, ScrollDriver, extract_cards, search_url, unseen_businesses)
+from result_sinks import open_sink
+from results_view import UiUpdater, VirtualList
+
+# Columns of the results list: (record key, heading, width)
+RESULT_COLUMNS = (
+    ('name', 'Name', 220), ('rating', 'Rating', 60), ('reviews', 'Reviews', 70),
+    ('type', 'Type', 140), ('location', 'Location', 200), ('address', 'Address', 220), ('phone', 'Phone', 120),
+    ('hours', 'Hours', 160), ('services', 'Services', 200), ('website', 'Website', 200),
+)
 
 class GMapsExtractorGUI:
     def __init__(self, root):
@@ -21,9 +29,24 @@ class GMapsExtractorGUI:
         self.style.configure("Modern.TLabel", font=('Helvetica', 10))
         
         self.setup_ui()
+        self.updater = UiUpdater(root)  # Browser-thread updates are applied once per frame
+        # The browser lives on this loop's thread; buttons post commands to it
+        self.commands = CommandLoop().start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.playwright = None
+        self.browser = None
+        self.page = None
         self.businesses = []
+        self.place_keys = set()  # place_key of every business found, for O(1) dedup
         self.processing = False
         self.should_stop = False
+        self.auto_scroll = False  # Mirrors auto_scroll_var for the browser thread
+        self.scroll_driver = None
+        self.capture = None  # ResponseCapture when reading results from network responses
+        self.enricher = None  # DetailEnricher when place pages are opened for details
+        self.row_index = {}  # id(business) -> its row in results_view, to redraw it once enriched
+        self.query = None
+        self.sink = None  # Streams each business to the file in the "Stream To" box
         
     def setup_ui(self):
         # Main container
@@ -48,6 +71,14 @@ class GMapsExtractorGUI:
         self.location_entry = ttk.Entry(location_frame, width=30)
         self.location_entry.pack(side=tk.LEFT, padx=5)
         
+        # Optional streaming output
+        stream_frame = ttk.Frame(search_frame)
+        stream_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(stream_frame, text="Stream To:", style="Modern.TLabel").pack(side=tk.LEFT)
+        self.stream_entry = ttk.Entry(stream_frame, width=50)
+        self.stream_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Button(stream_frame, text="Browse...", command=self.choose_stream_file).pack(side=tk.LEFT)
+        
         # Controls frame
         controls_frame = ttk.Frame(search_frame)
         controls_frame.pack(fill=tk.X, pady=5)
@@ -115,6 +146,22 @@ class GMapsExtractorGUI:
         )
         self.auto_scroll_check.pack(side=tk.LEFT, padx=5)
         
+        # Read results from Maps' own search responses instead of the rendered cards
+        self.capture_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            scroll_frame,
+            text="Capture network responses",
+            variable=self.capture_var
+        ).pack(side=tk.LEFT, padx=5)
+        
+        # Open each place's page in a few background tabs for website, address, phone and hours
+        self.enrich_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            scroll_frame,
+            text="Enrich details",
+            variable=self.enrich_var
+        ).pack(side=tk.LEFT, padx=5)
+        
         # Add results count display
         self.count_var = tk.StringVar(value="Results: 0")
         ttk.Label(
@@ -145,133 +192,158 @@ class GMapsExtractorGUI:
         results_frame = ttk.LabelFrame(main_container, text="Results", padding="10")
         results_frame.pack(fill=tk.BOTH, expand=True)
         
+        self.results_view = VirtualList(
+            results_frame,
+            columns=[key for key, _, _ in RESULT_COLUMNS],
+            headings=[heading for _, heading, _ in RESULT_COLUMNS],
+            widths=[width for _, _, width in RESULT_COLUMNS]
+        )
+        self.results_view.pack(fill=tk.BOTH, expand=True)
+        
+        # Messages and the final summary
         self.results_text = scrolledtext.ScrolledText(
             results_frame,
             wrap=tk.WORD,
             width=70,
-            height=20,
+            height=8,
             font=('Courier', 10)
         )
-        self.results_text.pack(fill=tk.BOTH, expand=True)
+        self.results_text.pack(fill=tk.X, pady=(10, 0))
 
     async def extract_business_info(self, page):
         """Extract business information from the current page"""
-        businesses = []
-        
         # Wait for business listings to load
-        await page.wait_for_selector('.bfdHYd', timeout=30000)
-        
-        # Get all business elements
-        business_elements = await page.query_selector_all('.bfdHYd')
+        await page.wait_for_selector(CARD_SELECTOR, timeout=30000)
         
-        for element in business_elements:
-            try:
-                business = {}
-                
-                # Extract business name
-                name_elem = await element.query_selector('.qBF1Pd')
-                if name_elem:
-                    business['name'] = await name_elem.inner_text()
-                
-                # Extract rating and reviews
-                rating_elem = await element.query_selector('.MW4etd')
-                reviews_elem = await element.query_selector('.UY7F9')
-                if rating_elem:
-                    business['rating'] = await rating_elem.inner_text()
-                if reviews_elem:
-                    reviews_text = await reviews_elem.inner_text()
-                    business['reviews'] = re.search(r'\((\d+)\)', reviews_text).group(1)
-                
-                # Extract business type and location
-                type_location = await element.query_selector_all('.W4Efsd span')
-                if type_location:
-                    business['type'] = await type_location[0].inner_text()
-                    if len(type_location) > 2:
-                        business['location'] = await type_location[2].inner_text()
-                
-                # Extract hours and phone
-                details = await element.query_selector_all('.W4Efsd .W4Efsd span')
-                for detail in details:
-                    text = await detail.inner_text()
-                    if 'Open' in text or 'Closed' in text:
-                        business['hours'] = text
-                    if re.match(r'\d{3}[\s-]?\d{3}[\s-]?\d{4}', text):
-                        business['phone'] = text
-                
-                # Extract additional services
-                services = await element.query_selector_all('.ah5Ghc span')
-                if services:
-                    business['services'] = [await service.inner_text() for service in services]
-                
-                if business:
-                    businesses.append(business)
-                    
-            except Exception as e:
-                logging.error(f"Error extracting business info: {str(e)}")
-                continue
-                
-        return businesses
+        # All new cards are read in one in-page call instead of per-element round-trips
+        return await extract_cards(page, only_new=True)
 
     async def scroll_page(self, page):
-        """Scroll the page to load more results"""
-        prev_height = 0
-        while True:
-            curr_height = await page.evaluate('document.documentElement.scrollHeight')
-            if curr_height == prev_height:
-                break
-            await page.evaluate('window.scrollTo(0, document.documentElement.scrollHeight)')
-            await page.wait_for_timeout(2000)  # Wait for content to load
-            prev_height = curr_height
+        """Scroll the results feed until the end of the list"""
+        driver = ScrollDriver(page)
+        while not driver.ended:
+            await driver.scroll_once()
 
     async def auto_scroll_and_fetch(self):
         """Continuously scroll and fetch while auto-scroll is enabled"""
         try:
-            while not self.should_stop and self.auto_scroll_var.get():
+            # Each step waits for the next cards itself, so there is no fixed pause
+            while not self.should_stop and self.auto_scroll and self.scroll_driver and not self.scroll_driver.ended:
                 await self.scroll_and_fetch_async()
-                await asyncio.sleep(2)  # Wait between scrolls
         except Exception as e:
-            self.root.after(0, lambda err=e: self.results_text.insert(tk.END, f"Auto-scroll error: {str(err)}\n"))
+            self.updater.call(self.log, f"Auto-scroll error: {str(e)}")
 
-    async def process_search(self, business_type, location):
+    async def process_search(self, business_type, location, capture, enrich):
         try:
-            async with async_playwright() as p:
-                self.browser = await p.chromium.launch(headless=False)
-                self.page = await self.browser.new_page()
-                
-                # Set viewport size for better scrolling
-                await self.page.set_viewport_size({"width": 1280, "height": 800})
-                
-                # Construct search URL
-                search_query = f"{business_type} {location}"
-                encoded_query = quote(search_query)
-                url = f"https://www.google.com/maps/search/{encoded_query}"
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=False)
+            self.page = await self.browser.new_page()
+            
+            # Set viewport size for better scrolling
+            await self.page.set_viewport_size({"width": 1280, "height": 800})
+            
+            url = search_url(f"{business_type} {location}")
+            
+            if capture:
+                self.capture = ResponseCapture(self.page, self.add_businesses).start()
+            if enrich:
+                self.enricher = DetailEnricher(self.page.context, tabs=3, on_done=self.business_enriched).start()
+            await self.page.goto(url, wait_until="networkidle")
+            
+            try:
+                # Wait for the feed to be available
+                await self.page.wait_for_selector(FEED_SELECTOR, timeout=10000)
+                self.scroll_driver = ScrollDriver(self.page)
                 
-                await self.page.goto(url, wait_until="networkidle")
-                await self.page.wait_for_timeout(3000)
+                # Enable scroll button after initial load
+                self.updater.call(self.scroll_btn.state, ['!disabled'])
                 
-                try:
-                    # Wait for the feed to be available
-                    await self.page.wait_for_selector('[role="feed"]', timeout=10000)
-                    
-                    # Enable scroll button after initial load
-                    self.root.after(0, lambda: self.scroll_btn.state(['!disabled']))
-                    
-                    # Extract initial results
+                # Extract initial results; the DOM is the fallback when no
+                # response could be decoded (e.g. after a payload change)
+                if self.capture:
+                    await self.capture.drain()
+                if not self.capture or not self.capture.records:
                     new_businesses = await self.extract_business_info(self.page)
                     if new_businesses:
-                        self.businesses.extend(new_businesses)
-                        self.root.after(0, lambda b=new_businesses: self.update_results(b))
-                        self.root.after(0, lambda: self.count_var.set(f"Results: {len(self.businesses)}"))
-                    
-                    # Start auto-scroll if enabled
-                    if self.auto_scroll_var.get():
-                        await self.auto_scroll_and_fetch()
-                        
-                except Exception as inner_e:
-                    self.root.after(0, lambda err=inner_e: self.results_text.insert(tk.END, f"Error during extraction: {str(err)}\n"))
+                        self.add_businesses(new_businesses)
+                self.updater.call(self.progress_var.set,
+                                  "Showing results - Load More or Auto-scroll for more, Stop to finish")
                 
+                # Start auto-scroll if enabled
+                if self.auto_scroll:
+                    await self.auto_scroll_and_fetch()
+                    
+            except Exception as inner_e:
+                self.updater.call(self.log, f"Error during extraction: {str(inner_e)}")
+                await self.close_session()
+            
         except Exception as outer_e:
-            self.root.after(0, lambda err=outer_e: self.results_text.insert(tk.END, f"Error starting search: {str(err)}\n"))
+            self.updater.call(self.log, f"Error starting search: {str(outer_e)}")
+            await self.close_session()
+
+    async def close_session(self):
+        """Close the browser and the output stream, then report; safe to call twice"""
+        if not self.processing:
+            return
+        self.processing = False
+        if self.capture:
+            await self.capture.drain()
+        if self.enricher:
+            if not self.should_stop and self.enricher.pending():
+                self.updater.call(self.progress_var.set, f"Loading details of {self.enricher.pending()} more businesses...")
+            try:
+                await self.enricher.close(finish=not self.should_stop)
+            except asyncio.CancelledError:
+                # Stop pressed while the last details loaded: keep the rest as they are
+                await self.enricher.close(finish=False)
+        try:
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
+        except Exception as e:
+            self.updater.call(self.log, f"Error closing browser: {str(e)}")
+        finally:
+            self.playwright = self.browser = self.page = None
+            if self.sink:
+                self.sink.close()
+            self.updater.call(self.finish_processing)
+
+    def add_businesses(self, businesses):
+        """Record unseen businesses, stream them out and refresh the display"""
+        new_businesses = unseen_businesses(businesses, self.place_keys)
+        if not new_businesses:
+            return
+        for business in new_businesses:
+            self.row_index[id(business)] = len(self.businesses)
+            self.businesses.append(business)
+        # Rows go out first: the enricher may finish (and update) a business right away
+        self.updater.add_rows(self.results_view, [result_row(business) for business in new_businesses])
+        self.updater.set_latest('count', self.count_var.set, f"Results: {len(self.businesses)}")
+        # Enriched businesses are streamed once their details are in
+        if self.enricher:
+            self.enricher.add(new_businesses)
+        else:
+            self.stream_businesses(new_businesses)
+
+    def business_enriched(self, business):
+        self.stream_businesses([business])
+        self.updater.call(self.results_view.set_row, self.row_index[id(business)], result_row(business))
+
+    def stream_businesses(self, businesses):
+        if self.sink:
+            found_at = datetime.now().isoformat(timespec='seconds')
+            self.sink.write_many([dict(business, query=self.query, found_at=found_at) for business in businesses])
+
+    def choose_stream_file(self):
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".jsonl",
+            filetypes=[("JSON lines", "*.jsonl"), ("CSV files", "*.csv"), ("SQLite database", "*.sqlite")],
+            initialfile=f"businesses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        )
+        if filename:
+            self.stream_entry.delete(0, tk.END)
+            self.stream_entry.insert(0, filename)
 
     def start_extraction(self):
         if self.processing:
@@ -285,40 +357,55 @@ class GMapsExtractorGUI:
             return
             
         self.processing = True
+        self.should_stop = False
+        self.auto_scroll = self.auto_scroll_var.get()
         self.businesses = []
+        self.place_keys = set()
+        self.scroll_driver = None
+        self.capture = None
+        self.enricher = None
+        self.row_index = {}
         self.progress_bar.start()
         self.extract_btn.state(['disabled'])
         self.stop_btn.state(['!disabled'])
         self.clear_btn.state(['disabled'])
         self.results_text.delete(1.0, tk.END)
+        self.results_view.clear()
         
-        threading.Thread(target=self.run_extraction, args=(business_type, location), daemon=True).start()
-
-    def run_extraction(self, business_type, location):
-        asyncio.run(self.process_search(business_type, location))
-        self.root.after(0, self.finish_processing)
+        self.query = f"{business_type} {location}"
+        stream_path = self.stream_entry.get().strip()
+        try:
+            self.sink = open_sink(stream_path, BUSINESS_FIELDS) if stream_path else None
+        except Exception as e:
+            self.sink = None
+            self.log(f"Cannot stream to {stream_path}: {str(e)}")
+        self.progress_var.set("Searching...")
+        # The session stays open after the first results so Load More and
+        # Auto-scroll keep working; it closes at the end of the list or on Stop
+        self.commands.submit(self.process_search, business_type, location, self.capture_var.get(),
+                             self.enrich_var.get())
 
-    def update_results(self, new_businesses):
-        self.results_text.insert(tk.END, f"\nFound {len(new_businesses)} new businesses:\n")
-        for business in new_businesses:
-            self.results_text.insert(tk.END, "\n-------------------\n")
-            for key, value in business.items():
-                if isinstance(value, list):
-                    self.results_text.insert(tk.END, f"{key}: {', '.join(value)}\n")
-                else:
-                    self.results_text.insert(tk.END, f"{key}: {value}\n")
+    def log(self, message):
+        self.results_text.insert(tk.END, f"{message}\n")
         self.results_text.see(tk.END)
 
     def stop_extraction(self):
         self.should_stop = True
+        self.auto_scroll = False
         self.auto_scroll_var.set(False)  # Disable auto-scroll
         self.progress_var.set("Stopping...")
         self.stop_btn.state(['disabled'])
         self.scroll_btn.state(['disabled'])
         
-        # Close browser if it exists
-        if hasattr(self, 'browser'):
-            asyncio.run(self.browser.close())
+        # Cancel the running scroll and any queued clicks, then close the browser on its own loop
+        self.commands.cancel()
+        self.commands.submit(self.close_session)
+
+    def on_close(self):
+        """Window closed: shut the browser down on its loop before leaving"""
+        self.should_stop = True
+        self.commands.shutdown(self.close_session)
+        self.root.destroy()
 
     def save_results(self):
         if not self.businesses:
@@ -341,11 +428,14 @@ class GMapsExtractorGUI:
     def clear_results(self):
         """Clear all results and reset the display"""
         self.results_text.delete(1.0, tk.END)
+        self.results_view.clear()
         self.businesses = []
+        self.place_keys = set()
+        self.row_index = {}
         self.progress_var.set("Ready")
         self.progress_bar.stop()
         self.progress_bar['value'] = 0
-        self.stats_var.set("Pages: 0 | Emails: 0")
+        self.count_var.set("Results: 0")
         
         # Add confirmation message
         self.results_text.insert(tk.END, "Results cleared.\n")
@@ -363,57 +453,60 @@ class GMapsExtractorGUI:
         # Show final summary
         self.results_text.insert(tk.END, "\n=== Final Summary ===\n")
         self.results_text.insert(tk.END, f"Total businesses found: {len(self.businesses)}\n")
+        if self.sink:
+            self.results_text.insert(tk.END, f"Streamed {self.sink.count} business(es) to {self.sink.path}\n")
+        if self.scroll_driver:
+            self.results_text.insert(tk.END, f"Scrolling: {self.scroll_driver.summary()}\n")
+        if self.capture:
+            self.results_text.insert(tk.END, f"Captured {self.capture.records} records from "
+                                             f"{self.capture.responses} responses\n")
+        if self.enricher:
+            self.results_text.insert(tk.END, f"Details: {self.enricher.summary()}\n")
         
         if self.should_stop:
             self.results_text.insert(tk.END, "Extraction was stopped by user\n")
 
     def toggle_auto_scroll(self):
         """Handle auto-scroll checkbox changes"""
-        if self.auto_scroll_var.get() and self.processing:
-            # Start auto-scrolling in a separate thread
-            threading.Thread(
-                target=lambda: asyncio.run(self.auto_scroll_and_fetch()),
-                daemon=True
-            ).start()
+        # Unticking ends a running auto-scroll after its current step
+        self.auto_scroll = self.auto_scroll_var.get()
+        if self.auto_scroll and self.processing and self.scroll_driver:
+            self.commands.submit(self.auto_scroll_and_fetch)
 
     def scroll_and_fetch(self):
         """Trigger a single scroll and fetch operation"""
-        if not self.processing:
+        # While auto-scroll runs every click would only queue behind it
+        if not self.processing or not self.scroll_driver or self.auto_scroll:
             return
-        
-        # Run in separate thread to prevent UI freeze
-        threading.Thread(
-            target=lambda: asyncio.run(self.scroll_and_fetch_async()),
-            daemon=True
-        ).start()
+        self.commands.submit(self.scroll_and_fetch_async)
 
     async def scroll_and_fetch_async(self):
         """Scroll once and fetch new results"""
         try:
-            # Scroll down
-            await self.page.evaluate('''
-                let feed = document.querySelector('[role="feed"]');
-                if (feed) {
-                    feed.scrollBy(0, 800);
-                } else {
-                    window.scrollBy(0, 800);
-                }
-            ''')
-            await self.page.wait_for_timeout(1500)  # Wait for content to load
-            
-            # Extract new results
-            new_businesses = await self.extract_business_info(self.page)
+            # Scroll down and wait until new cards arrive (or the list ends)
+            await self.scroll_driver.scroll_once()
             
-            # Update results
-            if new_businesses:
-                new_unique = [b for b in new_businesses if b not in self.businesses]
-                if new_unique:
-                    self.businesses.extend(new_unique)
-                    self.root.after(0, lambda b=new_unique: self.update_results(b))
-                    self.root.after(0, lambda: self.count_var.set(f"Results: {len(self.businesses)}"))
+            # Extract new results (in capture mode they arrive with the responses)
+            if self.capture and self.capture.records:
+                await self.capture.drain()
+            else:
+                new_businesses = await self.extract_business_info(self.page)
+                if new_businesses:
+                    self.add_businesses(new_businesses)
+            if self.scroll_driver.ended:
+                self.updater.call(self.log, "Reached the end of the results list")
+                await self.close_session()
             
         except Exception as e:
-            self.root.after(0, lambda err=e: self.results_text.insert(tk.END, f"Error during scroll: {str(err)}\n"))
+            self.updater.call(self.log, f"Error during scroll: {str(e)}")
+
+def result_row(business):
+    """Values for one results-list row; list fields are joined"""
+    row = []
+    for key, _, _ in RESULT_COLUMNS:
+        value = business.get(key, '')
+        row.append(', '.join(value) if isinstance(value, list) else value)
+    return row
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,245 @@
+"""Maps to email pipeline: crawl the website of every business the Maps searches find
+
+    python lead_pipeline.py queries.csv -o leads.jsonl --max-pages 10
+
+Searches run as in maps_batch.py. Each business with a website goes through
+a bounded queue to a pool of email crawls that share the searches' Chromium,
+and one record per business (its Maps fields plus the emails found on its
+site) is written to the output.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright
+
+from crawl_metrics import CrawlMetrics
+from email_crawler import BrowserPool, EmailCrawler, ResourcePolicy, TieredFetcher, site_host
+from maps_batch import MapsBatchRunner, SearchJob, read_queries
+from maps_scraper import BUSINESS_FIELDS
+from result_sinks import open_sink
+
+LEAD_FIELDS = BUSINESS_FIELDS + ('emails', 'pages_crawled')
+# Profiles and directories listed as a business "website" that are not worth crawling
+SKIPPED_HOSTS = ('facebook.com', 'instagram.com', 'twitter.com', 'x.com', 'linkedin.com', 'linktr.ee',
+                 'yelp.com', 'tripadvisor.com', 'google.com', 'youtube.com', 'tiktok.com')
+
+
+def crawlable_site(website):
+    """Host the crawl dedups on, or None for missing, non-HTTP or skipped websites"""
+    parsed = urlparse(website or '')
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return None
+    host = site_host(parsed.hostname)
+    if any(host == skipped or host.endswith(f".{skipped}") for skipped in SKIPPED_HOSTS):
+        return None
+    return f"{host}:{parsed.port}" if parsed.port else host
+
+
+class LeadPipeline:
+    """Feed business websites from the Maps searches into email crawls, with backpressure
+
+    Websites wait in a queue of at most queue_size entries; records from a
+    search in progress that do not fit are held back, and no new search
+    starts until the crawls have caught up. A site listed by several
+    businesses (chains) is crawled once.
+    """
+
+    def __init__(self, runner, max_pages=10, concurrent_tasks=3, sites=4, queue_size=20, use_sitemaps=True,
+                 resource_policy=None, sink=None, metrics=None):
+        self.runner = runner
+        self.max_pages = max_pages  # Page budget per site
+        self.concurrent_tasks = concurrent_tasks
+        self.sites = sites  # Sites crawled at once
+        self.queue_size = queue_size
+        self.use_sitemaps = use_sitemaps
+        self.resource_policy = resource_policy or ResourcePolicy()
+        self.sink = sink
+        self.metrics = metrics
+        self.fetcher = None
+        self.businesses = 0
+        self.leads = 0  # Businesses written with at least one email
+        self.site_results = {}  # Site host -> future of (emails, pages crawled)
+        self.started = None
+        self._queue = None
+        self._held = deque()  # Records waiting for room in the queue
+        self._room = None
+
+    async def run(self, jobs):
+        self.started = time.monotonic()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._room = asyncio.Event()
+        self._room.set()
+        self.runner.on_businesses = self.add_businesses
+        self.runner.throttle = self._room.wait
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=self.runner.headless)
+            self.runner.browser = browser
+            # Rendered site pages use contexts of the same browser as the searches
+            self.fetcher = TieredFetcher(
+                concurrency=self.concurrent_tasks * self.sites,
+                resource_policy=self.resource_policy,
+                browser_pool_factory=lambda: BrowserPool(
+                    size=self.sites, setup_page=self.resource_policy.install, browser=browser
+                )
+            )
+            await self.fetcher.start()
+            crawlers = [asyncio.create_task(self.crawl_worker()) for _ in range(self.sites)]
+            try:
+                await self.runner.run(jobs)
+                # Room is only signalled once every held record is queued
+                await self._room.wait()
+                await self._queue.join()
+            finally:
+                for crawler in crawlers:
+                    crawler.cancel()
+                await asyncio.gather(*crawlers, return_exceptions=True)
+                await self.fetcher.close()
+                await browser.close()
+
+    def add_businesses(self, records):
+        for record in records:
+            self.businesses += 1
+            if crawlable_site(record.get('website')):
+                self._held.append(record)
+            else:
+                self.emit(record, [], 0)
+        self.release_held()
+
+    def release_held(self):
+        while self._held and not self._queue.full():
+            self._queue.put_nowait(self._held.popleft())
+        if self._held or self._queue.full():
+            self._room.clear()
+        else:
+            self._room.set()
+
+    async def crawl_worker(self):
+        while True:
+            record = await self._queue.get()
+            self.release_held()
+            try:
+                emails, pages = await self.crawl_site(record['website'])
+            except Exception as e:
+                logging.error(f"Error crawling {record['website']}: {str(e)}")
+                emails, pages = [], 0
+            finally:
+                self._queue.task_done()
+            self.emit(record, emails, pages)
+
+    async def crawl_site(self, website):
+        """(emails, pages crawled) of a business website; chains share one crawl"""
+        host = crawlable_site(website)
+        if host in self.site_results:
+            return await self.site_results[host]
+        result = asyncio.get_running_loop().create_future()
+        self.site_results[host] = result
+        crawler = EmailCrawler(
+            website,
+            max_pages=self.max_pages,
+            concurrent_tasks=self.concurrent_tasks,
+            fetcher=self.fetcher,
+            use_sitemaps=self.use_sitemaps,
+            metrics=self.metrics
+        )
+        try:
+            await crawler.run()
+        except Exception as e:
+            logging.error(f"Error crawling {website}: {str(e)}")
+        result.set_result((sorted(crawler.emails_found), len(crawler.visited_urls)))
+        return result.result()
+
+    def emit(self, record, emails, pages):
+        if emails:
+            self.leads += 1
+        lead = dict(record, emails=emails, pages_crawled=pages)
+        if self.sink:
+            self.sink.write(lead)
+        logging.info(f"{record.get('name')}: {len(emails)} emails from {pages} pages")
+
+    def leads_per_minute(self):
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return self.leads / elapsed * 60 if elapsed > 0 else 0.0
+
+    def summary(self):
+        return (f"{self.businesses} businesses, {len(self.site_results)} sites crawled, "
+                f"{self.leads} with emails ({self.leads_per_minute():.1f} per minute)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find businesses on Google Maps and crawl their websites for emails")
+    parser.add_argument('queries', nargs='?', default='-',
+                        help="File with one 'business type,location' pair per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', required=True,
+                        help="Output file (.jsonl, .csv or .sqlite by extension); existing files are appended to")
+    parser.add_argument('--contexts', type=int, default=2, help="Browser contexts searching Maps in parallel")
+    parser.add_argument('--pace', type=float, default=3.0, help="Minimum seconds between searches of one context")
+    parser.add_argument('--retries', type=int, default=2, help="Retries of a failed search")
+    parser.add_argument('--max-results', type=int, help="Stop scrolling a search after this many results")
+    parser.add_argument('--capture', action='store_true',
+                        help="Read results from Maps' search responses instead of the rendered cards")
+    parser.add_argument('--enrich-tabs', type=int, default=2,
+                        help="Tabs per context that open place pages for the website (0 uses the cards only, "
+                             "which rarely list one)")
+    parser.add_argument('--max-pages', type=int, default=10, help="Page budget per website")
+    parser.add_argument('--concurrency', type=int, default=3, help="Concurrent pages per website")
+    parser.add_argument('--sites', type=int, default=4, help="Websites crawled in parallel")
+    parser.add_argument('--queue-size', type=int, default=20,
+                        help="Websites that may wait for a crawl before new searches are held back")
+    parser.add_argument('--no-sitemaps', action='store_true',
+                        help="Skip robots.txt/sitemap discovery and only follow links")
+    parser.add_argument('--headful', action='store_true', help="Show the browser windows")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.queries == '-':
+        pairs = read_queries(sys.stdin)
+    else:
+        with open(args.queries, encoding='utf-8') as f:
+            pairs = read_queries(f)
+    if not pairs:
+        parser.error("no queries given")
+
+    sink = open_sink(args.output, LEAD_FIELDS)
+    metrics = CrawlMetrics()
+    runner = MapsBatchRunner(
+        contexts=args.contexts,
+        pace=args.pace,
+        retries=args.retries,
+        capture=args.capture,
+        max_results=args.max_results,
+        headless=not args.headful,
+        enrich_tabs=args.enrich_tabs
+    )
+    pipeline = LeadPipeline(
+        runner,
+        max_pages=args.max_pages,
+        concurrent_tasks=args.concurrency,
+        sites=args.sites,
+        queue_size=args.queue_size,
+        use_sitemaps=not args.no_sitemaps,
+        sink=sink,
+        metrics=metrics
+    )
+    try:
+        asyncio.run(pipeline.run([SearchJob(query, location) for query, location in pairs]))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+    print(f"Maps: {runner.summary()}", file=sys.stderr)
+    print(f"Pages: {metrics.summary()}", file=sys.stderr)
+    print(f"Pipeline: {pipeline.summary()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # Run through the importable module, as email_crawler does
+    import lead_pipeline
+    lead_pipeline.main()
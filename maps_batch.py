@@ -0,0 +1,343 @@
+"""Headless batch mode for the Maps extractor: many searches, one browser, one deduplicated output
+
+    python maps_batch.py queries.csv -o businesses.jsonl --contexts 4
+
+The queries file has one "business type,location" pair per line (a tab
+works as the separator too); blank lines and # comments are skipped. With
+--bbox each business type is searched tile by tile over that box instead.
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+
+from playwright.async_api import async_playwright
+
+from email_crawler import USER_AGENT
+from maps_scraper import BUSINESS_FIELDS, DetailEnricher, collect_search, search_url
+from maps_tiles import (TileCoverage, merge_businesses, needs_split, parse_bbox, parse_grid, plan_tiles,
+                        tile_url)
+from result_sinks import open_sink
+
+
+def read_queries(source):
+    """(business type, location) pairs, one per line; a 'query,location' header is skipped"""
+    pairs = []
+    for line in source:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        row = next(csv.reader([line], delimiter='\t' if '\t' in line else ','))
+        query = row[0].strip()
+        location = row[1].strip() if len(row) > 1 else ''
+        if not pairs and (query.lower(), location.lower()) == ('query', 'location'):
+            continue
+        if query:
+            pairs.append((query, location))
+    return pairs
+
+
+class SearchJob:
+    """One Maps search of the batch and its retry state"""
+
+    def __init__(self, query, location, url=None, tile=None, bbox=None, on_done=None):
+        self.query = query
+        self.location = location
+        self.text = f"{query} {location}".strip()
+        self.url = url or search_url(self.text)
+        self.tile = tile
+        self.bbox = bbox  # Records placed outside this Tile are dropped
+        self.on_done = on_done  # Called with the job once it finished or was given up
+        self.attempts = 0
+        self.not_before = 0.0  # Monotonic time before which a retry must not start
+        self.produced = 0  # Records the search returned, duplicates included
+        self.added = 0  # Records that were new to the batch
+        self.error = None  # Last error of a search that was given up
+
+
+class MapsBatchRunner:
+    """Run many searches concurrently in isolated contexts of one headless Chromium
+
+    Each context runs one search at a time and starts a new one at most every
+    pace seconds (plus jitter). A failed search is retried on a fresh context
+    after an exponential backoff. Records are deduplicated across the whole
+    batch by place key before they reach the sink. With enrich_tabs, each
+    context also opens the new places' pages in that many tabs while the
+    search keeps scrolling, and records are written once enriched.
+    """
+
+    def __init__(self, contexts=4, pace=3.0, retries=2, capture=False, max_results=None, headless=True,
+                 enrich_tabs=0, sink=None, on_businesses=None, throttle=None, browser=None):
+        self.contexts = contexts
+        self.pace = pace
+        self.retries = retries
+        self.capture = capture
+        self.max_results = max_results
+        self.headless = headless
+        self.enrich_tabs = enrich_tabs
+        self.sink = sink
+        self.on_businesses = on_businesses  # Called with each batch of new records
+        self.throttle = throttle  # Awaited before each search, so a slower consumer can hold searches back
+        self.browser = browser  # Shared Chromium to search in; launched (and closed) here if None
+        self.place_keys = set()
+        self.records = 0
+        self.completed = 0
+        self.failed = 0
+        self.enrichers = []
+        self.started = None
+        self._queue = None
+
+    async def run(self, jobs):
+        self.started = time.monotonic()
+        self._queue = asyncio.Queue()
+        for job in jobs:
+            self._queue.put_nowait(job)
+        if self.browser:
+            await self.search_all()
+            return
+        async with async_playwright() as p:
+            self.browser = await p.chromium.launch(headless=self.headless)
+            try:
+                await self.search_all()
+            finally:
+                await self.browser.close()
+                self.browser = None
+
+    async def search_all(self):
+        workers = [asyncio.create_task(self.worker(index)) for index in range(self.contexts)]
+        finished = asyncio.ensure_future(self._queue.join())
+        stopped = asyncio.gather(*workers, return_exceptions=True)
+        try:
+            # Give up early if every worker died (e.g. the browser crashed)
+            await asyncio.wait([finished, stopped], return_when=asyncio.FIRST_COMPLETED)
+            if not finished.done():
+                for error in stopped.result():
+                    logging.error(f"Search worker failed: {str(error)}")
+        finally:
+            finished.cancel()
+            for worker in workers:
+                worker.cancel()
+            await stopped
+
+    def submit(self, job):
+        """Queue another search while the batch runs (e.g. a subdivided tile)"""
+        self._queue.put_nowait(job)
+
+    async def new_page(self):
+        context = await self.browser.new_context(
+            user_agent=USER_AGENT,
+            locale='en-US',
+            viewport={'width': 1280, 'height': 800}
+        )
+        return await context.new_page()
+
+    def new_enricher(self, page):
+        if not self.enrich_tabs:
+            return None
+        enricher = DetailEnricher(page.context, self.enrich_tabs, on_done=lambda business: self.emit([business]))
+        self.enrichers.append(enricher)
+        return enricher.start()
+
+    async def worker(self, index):
+        page = await self.new_page()
+        enricher = self.new_enricher(page)
+        last_start = 0.0
+        try:
+            while True:
+                job = await self._queue.get()
+                try:
+                    if self.throttle:
+                        await self.throttle()
+                    wait = max(job.not_before, last_start + self.pace * random.uniform(1.0, 1.5)) - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    last_start = time.monotonic()
+                    if await self.run_job(page, job, enricher):
+                        continue
+                    # A failed search may have left the context blocked or broken
+                    if enricher:
+                        await enricher.close(finish=False)
+                    await page.context.close()
+                    page = await self.new_page()
+                    enricher = self.new_enricher(page)
+                finally:
+                    self._queue.task_done()
+        finally:
+            if enricher:
+                await enricher.close(finish=False)
+            await page.context.close()
+
+    async def run_job(self, page, job, enricher=None):
+        """Run one search; on failure requeue it for a retry. Returns False if it failed"""
+        job.attempts += 1
+        try:
+            job.produced = await collect_search(
+                page, job.url, lambda businesses: self.add_businesses(job, businesses, enricher),
+                capture=self.capture, max_results=self.max_results
+            )
+            if enricher:
+                await enricher.join()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if job.attempts <= self.retries:
+                backoff = self.pace * 2 ** job.attempts
+                logging.warning(f"Search '{job.text}' failed (attempt {job.attempts}), retrying in {backoff:.0f}s: {str(e)}")
+                job.not_before = time.monotonic() + backoff
+                self.submit(job)
+            else:
+                logging.error(f"Search '{job.text}' failed after {job.attempts} attempts: {str(e)}")
+                self.failed += 1
+                job.error = str(e)
+                if job.on_done:
+                    job.on_done(job)
+            return False
+        self.completed += 1
+        logging.info(f"Search {job.url}: {job.produced} results, {job.added} new")
+        if job.on_done:
+            job.on_done(job)
+        return True
+
+    def add_businesses(self, job, businesses, enricher=None):
+        new_businesses = merge_businesses([businesses], self.place_keys, job.bbox)
+        if not new_businesses:
+            return
+        job.added += len(new_businesses)
+        self.records += len(new_businesses)
+        found_at = datetime.now().isoformat(timespec='seconds')
+        records = [dict(business, query=job.text, found_at=found_at) for business in new_businesses]
+        if enricher:
+            enricher.add(records)
+        else:
+            self.emit(records)
+
+    def emit(self, records):
+        if self.sink:
+            self.sink.write_many(records)
+        if self.on_businesses:
+            self.on_businesses(records)
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        summary = (f"{self.completed} searches done, {self.failed} failed, {self.records} unique businesses "
+                   f"in {elapsed:.0f}s")
+        if self.enrichers:
+            enriched = sum(enricher.enriched for enricher in self.enrichers)
+            failed = sum(enricher.failed for enricher in self.enrichers)
+            summary += f", details: {enriched} enriched, {failed} failed"
+        return summary
+
+
+class TiledSearch:
+    """One business type searched over a bounding box, tile by tile
+
+    Tiles whose search reaches cap results are split into quadrants (down to
+    max_depth) and the quadrants are queued on the same runner, so tiles of
+    every level run in parallel.
+    """
+
+    def __init__(self, runner, query, bbox, rows=2, cols=2, cap=100, max_depth=3):
+        self.runner = runner
+        self.query = query
+        self.bbox = bbox
+        self.rows = rows
+        self.cols = cols
+        self.cap = cap
+        self.max_depth = max_depth
+        self.coverage = TileCoverage(bbox)
+
+    def jobs(self):
+        return [self.job(tile) for tile in plan_tiles(self.bbox, self.rows, self.cols)]
+
+    def job(self, tile):
+        return SearchJob(self.query, '', url=tile_url(self.query, tile), tile=tile, bbox=self.bbox,
+                         on_done=self.job_done)
+
+    def job_done(self, job):
+        if job.error:
+            self.coverage.record_failure(job.tile)
+            return
+        split = needs_split(job.produced, self.cap, job.tile, self.max_depth)
+        self.coverage.record(job.tile, job.produced, job.added, split=split, capped=job.produced >= self.cap)
+        if split:
+            for tile in job.tile.split():
+                self.runner.submit(self.job(tile))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many Google Maps searches headlessly into one output")
+    parser.add_argument('queries', nargs='?', default='-',
+                        help="File with one 'business type,location' pair per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', required=True,
+                        help="Output file (.jsonl, .csv or .sqlite by extension); existing files are appended to")
+    parser.add_argument('--contexts', type=int, default=4, help="Browser contexts searching in parallel")
+    parser.add_argument('--pace', type=float, default=3.0, help="Minimum seconds between searches of one context")
+    parser.add_argument('--retries', type=int, default=2, help="Retries of a failed search")
+    parser.add_argument('--max-results', type=int, help="Stop scrolling a search after this many results")
+    parser.add_argument('--capture', action='store_true',
+                        help="Read results from Maps' search responses instead of the rendered cards")
+    parser.add_argument('--headful', action='store_true', help="Show the browser windows")
+    parser.add_argument('--enrich-tabs', type=int, default=0,
+                        help="Tabs per context that open each place page for website, address, phone, "
+                             "plus code and hours (0 keeps the list cards only)")
+    parser.add_argument('--bbox', metavar='S,W,N,E',
+                        help="Search each business type tile by tile over this box (the location column is ignored)")
+    parser.add_argument('--grid', default='2x2', help="Initial tiles over --bbox, as ROWSxCOLS")
+    parser.add_argument('--tile-cap', type=int, default=100,
+                        help="Results at which a tile counts as truncated and is split in four")
+    parser.add_argument('--max-depth', type=int, default=3, help="How many times a planned tile may be split")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.queries == '-':
+        pairs = read_queries(sys.stdin)
+    else:
+        with open(args.queries, encoding='utf-8') as f:
+            pairs = read_queries(f)
+    if not pairs:
+        parser.error("no queries given")
+    try:
+        bbox = parse_bbox(args.bbox) if args.bbox else None
+        rows, cols = parse_grid(args.grid)
+    except ValueError as e:
+        parser.error(str(e))
+
+    sink = open_sink(args.output, BUSINESS_FIELDS)
+    runner = MapsBatchRunner(
+        contexts=args.contexts,
+        pace=args.pace,
+        retries=args.retries,
+        capture=args.capture,
+        max_results=args.max_results,
+        headless=not args.headful,
+        enrich_tabs=args.enrich_tabs,
+        sink=sink
+    )
+    searches = []
+    if bbox:
+        # Each business type once, whatever locations it was listed with
+        for query in dict.fromkeys(query for query, _ in pairs):
+            searches.append(TiledSearch(runner, query, bbox, rows, cols, args.tile_cap, args.max_depth))
+        jobs = [job for search in searches for job in search.jobs()]
+    else:
+        jobs = [SearchJob(query, location) for query, location in pairs]
+    try:
+        asyncio.run(runner.run(jobs))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+    for search in searches:
+        print(f"Coverage of '{search.query}': {search.coverage.summary()}", file=sys.stderr)
+    print(f"Batch: {runner.summary()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
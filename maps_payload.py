@@ -0,0 +1,136 @@
+"""Decode Google Maps search responses into business records, without a browser
+
+    python maps_payload.py recorded_response.txt [...]
+
+prints the records parsed from responses saved by the Maps capture mode,
+one JSON object per line, so the parser can be checked against fixtures.
+"""
+import json
+import re
+import sys
+
+XSSI_PREFIX = ")]}'"
+# Place feature ids look like "0x47a84e373f035901:0x42120465b5e3b70"
+FEATURE_ID = re.compile(r'0x[0-9a-f]+:0x[0-9a-f]+', re.IGNORECASE)
+INITIAL_STATE = re.compile(r'window\.APP_INITIALIZATION_STATE\s*=\s*')
+SEARCH_PATHS = ('/search?', '/maps/search/', '/maps/preview/')
+
+
+def is_search_response(url):
+    """Responses that carry search results: the first page and every pagination XHR"""
+    return 'google.' in url and any(path in url for path in SEARCH_PATHS)
+
+
+def dig(data, *path):
+    """data[path[0]][path[1]]...; None when any step is missing"""
+    for key in path:
+        try:
+            data = data[key]
+        except (IndexError, KeyError, TypeError):
+            return None
+    return data
+
+
+def load_json(text):
+    """Parse a possibly XSSI-guarded JSON body"""
+    text = text.lstrip()
+    if text.startswith(XSSI_PREFIX):
+        text = text[len(XSSI_PREFIX):]
+    # Pagination responses may end with a '/*""*/' trailer
+    return json.JSONDecoder().raw_decode(text.strip())[0]
+
+
+def decode_body(text):
+    """JSON payload of a search response body (XHR or first page HTML), or None"""
+    match = INITIAL_STATE.search(text)
+    if match:
+        try:
+            state = json.JSONDecoder().raw_decode(text, match.end())[0]
+        except ValueError:
+            return None
+        embedded = dig(state, 3, 2)
+        if not isinstance(embedded, str):
+            return state
+        try:
+            return load_json(embedded)
+        except ValueError:
+            return None
+    try:
+        data = load_json(text)
+        # Some endpoints wrap the guarded payload again as {"c": 0, "d": ")]}'..."}
+        if isinstance(data, dict) and isinstance(data.get('d'), str):
+            return load_json(data['d'])
+    except ValueError:
+        return None
+    return data
+
+
+def is_place(node):
+    return (isinstance(node, list) and len(node) > 13 and isinstance(node[11], str)
+            and isinstance(node[10], str) and FEATURE_ID.fullmatch(node[10]) is not None)
+
+
+def iter_places(data):
+    """Every place array in the payload, wherever the current layout nests it"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if is_place(node):
+            yield node
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+
+
+def place_to_business(place):
+    """Map one place array onto the record fields used by the DOM extractor"""
+    business = {'name': place[11]}
+    rating = dig(place, 4, 7)
+    if isinstance(rating, (int, float)):
+        business['rating'] = str(rating)
+    reviews = dig(place, 4, 8)
+    if isinstance(reviews, int):
+        business['reviews'] = str(reviews)
+    category = dig(place, 13, 0)
+    if isinstance(category, str):
+        business['type'] = category
+    address = dig(place, 39)
+    if not isinstance(address, str):
+        address = ', '.join(part for part in (dig(place, 2) or []) if isinstance(part, str))
+    if address:
+        business['location'] = address
+    hours = dig(place, 34, 4, 4)
+    if isinstance(hours, str):
+        business['hours'] = hours
+    phone = dig(place, 178, 0, 0)
+    if isinstance(phone, str):
+        business['phone'] = phone
+    website = dig(place, 7, 0)
+    if isinstance(website, str):
+        business['website'] = website
+    lat, lng = dig(place, 9, 2), dig(place, 9, 3)
+    if isinstance(lat, (int, float)) and isinstance(lng, (int, float)):
+        # Same !8m2!3d..!4d.. block as the cards' links, so bbox filtering works on captured records too
+        business['link'] = (f"https://www.google.com/maps/place/data=!4m5!3m4!1s{place[10]}"
+                            f"!8m2!3d{lat:.7f}!4d{lng:.7f}")
+    else:
+        business['link'] = f"https://www.google.com/maps/place/data=!4m2!3m1!1s{place[10]}"
+    return business
+
+
+def parse_search_payload(text):
+    """Business records in one recorded search response body"""
+    data = decode_body(text)
+    if data is None:
+        return []
+    return [place_to_business(place) for place in iter_places(data)]
+
+
+def main(argv=None):
+    for path in (argv if argv is not None else sys.argv[1:]):
+        with open(path, encoding='utf-8') as f:
+            for business in parse_search_payload(f.read()):
+                print(json.dumps(business, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,517 @@
+"""Headless Google Maps result extraction shared by the Maps GUI and the benchmarks"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import re
+import threading
+from urllib.parse import parse_qs, quote, urlparse
+
+from maps_payload import is_search_response, parse_search_payload
+
+CARD_SELECTOR = '.bfdHYd'
+FEED_SELECTOR = '[role="feed"]'
+# Cards not yet read by extract_cards(only_new=True); it marks what it reads
+NEW_CARD_SELECTOR = '.bfdHYd:not([data-extracted])'
+# Feature id in place links (".../data=!...!1s0x47a84e:0x8b1d2c...!..."); the second half is the CID
+PLACE_FEATURE_ID = re.compile(r'!1s(0x[0-9a-f]+):(0x[0-9a-f]+)', re.IGNORECASE)
+REVIEWS_PATTERN = re.compile(r'\((\d+)\)')
+PHONE_PATTERN = re.compile(r'\d{3}[\s-]?\d{3}[\s-]?\d{4}')
+
+# Columns of streamed business records
+BUSINESS_FIELDS = ('name', 'rating', 'reviews', 'type', 'location', 'address', 'plus_code', 'hours', 'phone',
+                   'services', 'website', 'link', 'query', 'found_at')
+
+# Runs in the page: serialise every card's raw texts in one round-trip
+CARD_TEXTS_JS = '''
+cards => cards.map(card => {
+    card.dataset.extracted = '1';
+    const result = card.closest('[role="article"]') || card.parentElement;
+    const link = result && result.querySelector('a[href*="/maps/place/"]');
+    const text = selector => {
+        const element = card.querySelector(selector);
+        return element ? element.innerText : null;
+    };
+    const texts = selector => Array.from(card.querySelectorAll(selector), element => element.innerText);
+    return {
+        name: text('.qBF1Pd'),
+        rating: text('.MW4etd'),
+        reviews: text('.UY7F9'),
+        spans: texts('.W4Efsd span'),
+        details: texts('.W4Efsd .W4Efsd span'),
+        services: texts('.ah5Ghc span'),
+        link: link ? link.href : null,
+    };
+})
+'''
+
+
+def card_to_business(card):
+    """Turn one card's raw texts into a business record (same fields as the per-element path)"""
+    business = {}
+    if card['name'] is not None:
+        business['name'] = card['name']
+    if card['rating'] is not None:
+        business['rating'] = card['rating']
+    if card['reviews'] is not None:
+        match = REVIEWS_PATTERN.search(card['reviews'])
+        if match:
+            business['reviews'] = match.group(1)
+
+    # Business type and location
+    spans = card['spans']
+    if spans:
+        business['type'] = spans[0]
+        if len(spans) > 2:
+            business['location'] = spans[2]
+
+    # Hours and phone
+    for text in card['details']:
+        if 'Open' in text or 'Closed' in text:
+            business['hours'] = text
+        if PHONE_PATTERN.match(text):
+            business['phone'] = text
+
+    if card['services']:
+        business['services'] = card['services']
+    if business and card.get('link'):
+        business['link'] = card['link']
+    return business
+
+
+async def extract_cards(page, only_new=False):
+    """Extract result cards with a single evaluate call
+
+    With only_new, cards read by an earlier call are skipped in the page
+    itself, so each scroll step costs the same however long the list is.
+    """
+    selector = NEW_CARD_SELECTOR if only_new else CARD_SELECTOR
+    cards = await page.eval_on_selector_all(selector, CARD_TEXTS_JS)
+    return [business for business in map(card_to_business, cards) if business]
+
+
+def place_key(business):
+    """Stable identity of a place: its CID, else its link, else its visible details"""
+    link = business.get('link')
+    if link:
+        match = PLACE_FEATURE_ID.search(link)
+        return f"cid:{int(match.group(2), 16)}" if match else link.split('?')[0]
+    return (business.get('name'), business.get('location'), business.get('phone'))
+
+
+def unseen_businesses(businesses, seen_keys):
+    """Businesses whose place key is not in seen_keys yet; adds their keys"""
+    fresh = []
+    for business in businesses:
+        key = place_key(business)
+        if key not in seen_keys:
+            seen_keys.add(key)
+            fresh.append(business)
+    return fresh
+
+
+# Runs in the page: scroll the results feed, then wait (MutationObserver) until
+# more cards arrive, the end-of-list marker shows up, or the timeout expires
+SCROLL_AND_WAIT_JS = '''
+async ([step, timeoutMs]) => {
+    const feed = document.querySelector('[role="feed"]');
+    const countCards = () => document.querySelectorAll('.bfdHYd').length;
+    const atEnd = () => !!document.querySelector('.HlvSq') ||
+        (feed ? feed.innerText : '').includes("reached the end of the list");
+    const before = countCards();
+    const started = performance.now();
+    if (feed) {
+        feed.scrollBy(0, step);
+    } else {
+        window.scrollBy(0, step);
+    }
+    const done = () => countCards() > before || atEnd();
+    if (!done()) {
+        await new Promise(resolve => {
+            const observer = new MutationObserver(() => {
+                if (done()) {
+                    observer.disconnect();
+                    clearTimeout(timer);
+                    resolve();
+                }
+            });
+            const timer = setTimeout(() => { observer.disconnect(); resolve(); }, timeoutMs);
+            observer.observe(feed || document.body, {childList: true, subtree: true, characterData: true});
+        });
+    }
+    return {added: countCards() - before, ended: atEnd(), ms: performance.now() - started};
+}
+'''
+
+
+class ScrollDriver:
+    """Scroll the Maps results feed and wait for content instead of sleeping
+
+    The step grows while loads keep arriving and shrinks after a timeout;
+    the list counts as finished at Google's end-of-list marker or after
+    max_stalls timeouts in a row.
+    """
+
+    def __init__(self, page, step=800, min_step=400, max_step=6400, timeout_ms=8000, max_stalls=3):
+        self.page = page
+        self.step = step
+        self.min_step = min_step
+        self.max_step = max_step
+        self.timeout_ms = timeout_ms
+        self.max_stalls = max_stalls
+        self.stalls = 0
+        self.ended = False
+        self.load_times = []  # Milliseconds until new cards appeared, per successful scroll
+
+    async def scroll_once(self):
+        """Scroll one step and wait; returns how many cards were added"""
+        if self.ended:
+            return 0
+        result = await self.page.evaluate(SCROLL_AND_WAIT_JS, [self.step, self.timeout_ms])
+        if result['added']:
+            self.stalls = 0
+            self.load_times.append(result['ms'])
+            self.step = min(self.max_step, int(self.step * 1.5))
+        else:
+            self.stalls += 1
+            self.step = max(self.min_step, self.step // 2)
+        self.ended = result['ended'] or self.stalls >= self.max_stalls
+        return result['added']
+
+    def summary(self):
+        if not self.load_times:
+            return "no loads recorded"
+        times = sorted(self.load_times)
+        return (f"{len(times)} loads, median {times[len(times) // 2]:.0f} ms, "
+                f"slowest {times[-1]:.0f} ms{', reached end of list' if self.ended else ''}")
+
+
+class ResponseCapture:
+    """Turn the page's search/pagination responses into business records
+
+    Bodies are decoded in a worker thread so the browser's event loop keeps
+    serving the page; with record_dir every raw body is also saved as a
+    fixture for maps_payload.py.
+    """
+
+    def __init__(self, page, on_businesses, record_dir=None):
+        self.page = page
+        self.on_businesses = on_businesses  # Called with each response's records
+        self.record_dir = record_dir
+        self.responses = 0
+        self.records = 0
+        self._tasks = set()
+
+    def start(self):
+        if self.record_dir:
+            os.makedirs(self.record_dir, exist_ok=True)
+        self.page.on('response', self.on_response)
+        return self
+
+    def on_response(self, response):
+        if is_search_response(response.url):
+            task = asyncio.ensure_future(self.handle(response))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def handle(self, response):
+        try:
+            body = await response.text()
+        except Exception as e:
+            logging.debug(f"Could not read {response.url}: {str(e)}")
+            return
+        self.responses += 1
+        if self.record_dir:
+            path = os.path.join(self.record_dir, f"response_{self.responses:04d}.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(body)
+        businesses = await asyncio.get_running_loop().run_in_executor(None, parse_search_payload, body)
+        if businesses:
+            self.records += len(businesses)
+            self.on_businesses(businesses)
+
+    async def drain(self):
+        """Wait for responses that are still being decoded"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self):
+        self.page.remove_listener('response', self.on_response)
+
+
+def search_url(query):
+    return f"https://www.google.com/maps/search/{quote(query)}"
+
+
+async def collect_search(page, url, on_businesses, capture=False, max_results=None, timeout_ms=15000):
+    """Load a search URL and scroll its feed to the end, passing each batch of records on
+
+    Returns how many records the search produced, duplicates included. With
+    capture the records come from the search responses, and the rendered
+    cards are the fallback as in the GUI.
+    """
+    produced = 0
+
+    def deliver(businesses):
+        nonlocal produced
+        produced += len(businesses)
+        on_businesses(businesses)
+
+    capturer = ResponseCapture(page, deliver).start() if capture else None
+    try:
+        await page.goto(url, wait_until='domcontentloaded')
+        await page.wait_for_selector(FEED_SELECTOR, timeout=timeout_ms)
+        await page.wait_for_selector(CARD_SELECTOR, timeout=timeout_ms)
+        driver = ScrollDriver(page)
+        while True:
+            if capturer:
+                await capturer.drain()
+            if not capturer or not capturer.records:
+                businesses = await extract_cards(page, only_new=True)
+                if businesses:
+                    deliver(businesses)
+            if driver.ended or (max_results and produced >= max_results):
+                break
+            await driver.scroll_once()
+        logging.debug(f"Scrolled {url}: {driver.summary()}")
+    finally:
+        if capturer:
+            capturer.stop()
+            await capturer.drain()
+    return produced
+
+
+# Runs on a place page: the detail rows Maps tags with data-item-id
+DETAILS_JS = '''
+() => {
+    const item = selector => document.querySelector(`[data-item-id${selector}]`);
+    const label = element => {
+        if (!element) return null;
+        const text = element.querySelector('.Io6YTe');
+        return text ? text.innerText : element.getAttribute('aria-label');
+    };
+    const website = item('="authority"');
+    const phone = item('^="phone:tel:"');
+    const weekHours = document.querySelector('[aria-label*="hours for the week"]');
+    const hourRows = Array.from(document.querySelectorAll('table.eK4R0e tr'), row =>
+        Array.from(row.querySelectorAll('td'), cell => cell.innerText.trim()).filter(Boolean).join(' '));
+    return {
+        website: website ? website.href : null,
+        address: label(item('="address"')),
+        phone: label(phone),
+        phone_tel: phone ? phone.dataset.itemId.slice('phone:tel:'.length) : null,
+        plus_code: label(item('="oloc"')),
+        hours: weekHours ? weekHours.getAttribute('aria-label') : (hourRows.filter(Boolean).join('; ') || null),
+    };
+}
+'''
+DETAIL_ROWS_SELECTOR = '[data-item-id="address"], [data-item-id^="phone:tel:"], [data-item-id="authority"]'
+# aria-label fallbacks read "Address: 1 Main St"; hours end with "Hide open hours for the week"
+LABEL_PREFIX = re.compile(r'^(?:Address|Phone|Plus code|Website):\s*', re.IGNORECASE)
+HOURS_SUFFIX = re.compile(r'[.;,]?\s*(?:Hide|Show|Copy) open hours(?: for the week)?\.?\s*$', re.IGNORECASE)
+BLOCKED_RESOURCES = ('image', 'media', 'font')
+
+
+def details_to_fields(details):
+    """Clean the raw detail texts into record fields; missing details are left out"""
+    fields = {}
+    website = details.get('website')
+    if website:
+        # Outbound links may go through Google's redirector
+        parsed = urlparse(website)
+        if parsed.path == '/url' and 'google.' in parsed.netloc:
+            website = parse_qs(parsed.query).get('q', [website])[0]
+        fields['website'] = website
+    for key in ('address', 'plus_code'):
+        if details.get(key):
+            fields[key] = LABEL_PREFIX.sub('', details[key].strip())
+    phone = details.get('phone') or details.get('phone_tel')
+    if phone:
+        fields['phone'] = LABEL_PREFIX.sub('', phone.strip())
+    if details.get('hours'):
+        fields['hours'] = HOURS_SUFFIX.sub('', details['hours'].strip())
+    return fields
+
+
+async def fetch_details(page, url, timeout_ms=15000):
+    """Detail fields of one place page"""
+    await page.goto(url, wait_until='domcontentloaded', timeout=timeout_ms)
+    try:
+        await page.wait_for_selector(DETAIL_ROWS_SELECTOR, timeout=timeout_ms)
+    except Exception:
+        pass  # Some places list none of these; read whatever is there
+    return details_to_fields(await page.evaluate(DETAILS_JS))
+
+
+async def block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class DetailEnricher:
+    """Open businesses' place pages in a bounded pool of tabs and merge the details into their records
+
+    Records are queued as the scroll loop finds them and enriched while it
+    keeps scrolling; on_done gets every queued record exactly once, enriched
+    or not (no link, a failed page, or closed before its turn).
+    """
+
+    def __init__(self, context, tabs=3, on_done=None, timeout_ms=15000):
+        self.context = context
+        self.tabs = tabs
+        self.on_done = on_done
+        self.timeout_ms = timeout_ms
+        self.enriched = 0
+        self.failed = 0
+        self._queue = None
+        self._workers = []
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.ensure_future(self.worker()) for _ in range(self.tabs)]
+        return self
+
+    def add(self, businesses):
+        for business in businesses:
+            if business.get('link'):
+                self._queue.put_nowait(business)
+            elif self.on_done:
+                self.on_done(business)
+
+    def pending(self):
+        return self._queue.qsize() if self._queue else 0
+
+    async def worker(self):
+        page = None
+        try:
+            while True:
+                business = await self._queue.get()
+                try:
+                    if page is None or page.is_closed():
+                        page = await self.context.new_page()
+                        await page.route('**/*', block_heavy_resources)
+                    business.update(await fetch_details(page, business['link'], self.timeout_ms))
+                    self.enriched += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    logging.debug(f"Could not enrich {business.get('name')}: {str(e)}")
+                finally:
+                    self._queue.task_done()
+                    if self.on_done:
+                        self.on_done(business)
+        finally:
+            if page is not None and not page.is_closed():
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+
+    async def join(self):
+        """Wait until every queued record has been enriched"""
+        if self._queue:
+            await self._queue.join()
+
+    async def close(self, finish=True):
+        """Stop the tabs; with finish, after the queue is done, else passing the rest on as they are"""
+        if finish:
+            await self.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while self._queue and not self._queue.empty():
+            business = self._queue.get_nowait()
+            if self.on_done:
+                self.on_done(business)
+
+    def summary(self):
+        return f"{self.enriched} enriched, {self.failed} failed"
+
+
+class CommandLoop:
+    """One background thread running one event loop; commands posted to it run one at a time
+
+    Commands are coroutine functions submitted from any thread (typically the
+    Tk thread). They run in posting order, so two commands never drive the
+    same page at once, and the loop lives as long as the session instead of
+    being started per click.
+    """
+
+    def __init__(self, name='maps-loop'):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._queue = None
+        self._current = None  # Task of the command that is running
+        self._ready = threading.Event()
+
+    def start(self):
+        self.thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._queue = asyncio.Queue()
+        self.loop.create_task(self._serve())
+        self.loop.call_soon(self._ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    async def _serve(self):
+        while True:
+            command, args, future = await self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._current = asyncio.ensure_future(command(*args))
+            # asyncio.wait does not cancel the command when this loop is cancelled
+            await asyncio.wait([self._current])
+            task, self._current = self._current, None
+            if task.cancelled():
+                future.set_exception(concurrent.futures.CancelledError())
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+    def submit(self, command, *args):
+        """Queue command(*args) from any thread; returns a concurrent.futures.Future"""
+        future = concurrent.futures.Future()
+        self.loop.call_soon_threadsafe(self._queue.put_nowait, (command, args, future))
+        return future
+
+    def cancel(self):
+        """Cancel the running command and drop the queued ones (thread-safe)
+
+        Commands submitted after this call still run.
+        """
+        self.loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            future.cancel()
+        if self._current:
+            self._current.cancel()
+
+    def shutdown(self, cleanup=None, timeout=10):
+        """Cancel everything, await cleanup() on the loop, then stop the thread"""
+        if not self.thread.is_alive():
+            return
+        self.cancel()
+        if cleanup:
+            try:
+                self.submit(cleanup).result(timeout)
+            except Exception as e:
+                logging.error(f"Error during shutdown: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
@@ -0,0 +1,201 @@
+"""Split a bounding box into viewport-centred Maps searches and merge what they find
+
+Maps stops a search after about 120 results, so a metro-wide query is
+searched tile by tile instead; a tile whose search hits the cap is split
+into four and searched again. Everything here is pure and runs offline.
+"""
+import math
+import re
+from urllib.parse import quote
+
+from maps_scraper import place_key
+
+VIEWPORT = (1280, 800)  # Browser viewport the zoom level is fitted to, in pixels
+MIN_ZOOM = 3
+MAX_ZOOM = 21
+# Place links carry their coordinates: ".../data=!4m7!3m6!1s0x...:0x...!8m2!3d40.71!4d-74.01!..."
+PLACE_COORDINATES = re.compile(r'!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)')
+
+
+class Tile:
+    """A latitude/longitude box searched as one Maps viewport"""
+
+    def __init__(self, south, west, north, east, depth=0):
+        self.south = south
+        self.west = west
+        self.north = north
+        self.east = east
+        self.depth = depth  # Times it was split off from a planned tile
+
+    def __repr__(self):
+        return f"Tile({self.south:.5f}, {self.west:.5f}, {self.north:.5f}, {self.east:.5f}, depth={self.depth})"
+
+    def __eq__(self, other):
+        return isinstance(other, Tile) and self.bounds() == other.bounds() and self.depth == other.depth
+
+    def __hash__(self):
+        return hash((self.bounds(), self.depth))
+
+    def bounds(self):
+        return self.south, self.west, self.north, self.east
+
+    def center(self):
+        return (self.south + self.north) / 2, (self.west + self.east) / 2
+
+    def area(self):
+        return (self.north - self.south) * (self.east - self.west)
+
+    def contains(self, lat, lng):
+        return self.south <= lat <= self.north and self.west <= lng <= self.east
+
+    def split(self):
+        """The four quadrants, one level deeper"""
+        lat, lng = self.center()
+        depth = self.depth + 1
+        return [
+            Tile(self.south, self.west, lat, lng, depth),
+            Tile(self.south, lng, lat, self.east, depth),
+            Tile(lat, self.west, self.north, lng, depth),
+            Tile(lat, lng, self.north, self.east, depth),
+        ]
+
+
+def parse_bbox(text):
+    """Tile of a "south,west,north,east" string; raises ValueError if it is not a valid box"""
+    parts = [float(part) for part in text.split(',')]
+    if len(parts) != 4:
+        raise ValueError("expected south,west,north,east")
+    south, west, north, east = parts
+    if not (-90 <= south < north <= 90 and -180 <= west < east <= 180):
+        raise ValueError("expected south < north and west < east, in degrees")
+    return Tile(south, west, north, east)
+
+
+def parse_grid(text):
+    """(rows, cols) of a "ROWSxCOLS" string such as "4x4" """
+    rows, _, cols = text.lower().partition('x')
+    rows, cols = int(rows), int(cols or rows)
+    if rows < 1 or cols < 1:
+        raise ValueError("grid needs at least one row and one column")
+    return rows, cols
+
+
+def plan_tiles(bbox, rows, cols):
+    """Cut bbox into a rows x cols grid, row by row from the south-west corner"""
+    lat_step = (bbox.north - bbox.south) / rows
+    lng_step = (bbox.east - bbox.west) / cols
+    tiles = []
+    for row in range(rows):
+        for col in range(cols):
+            tiles.append(Tile(
+                bbox.south + row * lat_step,
+                bbox.west + col * lng_step,
+                bbox.north if row == rows - 1 else bbox.south + (row + 1) * lat_step,
+                bbox.east if col == cols - 1 else bbox.west + (col + 1) * lng_step,
+                bbox.depth
+            ))
+    return tiles
+
+
+def mercator_y(lat):
+    lat = max(-85.0511, min(85.0511, lat))
+    return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+
+def zoom_for(tile, viewport=VIEWPORT):
+    """Deepest whole Web Mercator zoom at which the whole tile fits the viewport"""
+    width, height = viewport
+    # At zoom z the world is 256 * 2**z pixels across
+    lng_span = max(tile.east - tile.west, 1e-9) / 360
+    y_span = max(mercator_y(tile.north) - mercator_y(tile.south), 1e-9) / (2 * math.pi)
+    zoom = math.floor(min(math.log2(width / 256 / lng_span), math.log2(height / 256 / y_span)))
+    return max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+
+
+def tile_url(query, tile, viewport=VIEWPORT):
+    """Search URL centred on the tile at a zoom that shows all of it"""
+    lat, lng = tile.center()
+    return f"https://www.google.com/maps/search/{quote(query)}/@{lat:.6f},{lng:.6f},{zoom_for(tile, viewport)}z"
+
+
+def needs_split(produced, cap, tile, max_depth):
+    """Whether a tile's search was cut off by the result cap and can still be split"""
+    return produced >= cap and tile.depth < max_depth
+
+
+def place_coordinates(business):
+    """(lat, lng) from the business's place link, or None"""
+    match = PLACE_COORDINATES.search(business.get('link') or '')
+    return (float(match.group(1)), float(match.group(2))) if match else None
+
+
+def merge_businesses(batches, seen_keys, bbox=None):
+    """New businesses of several result batches, deduplicated by place key
+
+    Places whose link puts them outside bbox are dropped (Maps pads a
+    viewport search with nearby results); places without coordinates are
+    kept. seen_keys is updated, so it carries the dedup across calls.
+    """
+    merged = []
+    for businesses in batches:
+        for business in businesses:
+            if bbox:
+                coordinates = place_coordinates(business)
+                if coordinates and not bbox.contains(*coordinates):
+                    continue
+            key = place_key(business)
+            if key not in seen_keys:
+                seen_keys.add(key)
+                merged.append(business)
+    return merged
+
+
+class TileCoverage:
+    """How completely a tiled search covered its box"""
+
+    def __init__(self, bbox):
+        self.bbox = bbox
+        self.searched = 0
+        self.split = 0
+        self.capped = []  # Tiles still at the cap at max depth: results there may be missing
+        self.failed = []
+        self.produced = 0
+        self.added = 0
+        self.depths = {}  # depth -> tiles searched
+
+    def record(self, tile, produced, added, split=False, capped=False):
+        self.searched += 1
+        self.produced += produced
+        self.added += added
+        self.depths[tile.depth] = self.depths.get(tile.depth, 0) + 1
+        if split:
+            self.split += 1
+        elif capped:
+            self.capped.append(tile)
+
+    def record_failure(self, tile):
+        self.failed.append(tile)
+
+    def complete_share(self):
+        """Share of the box whose tiles finished under the cap"""
+        missing = sum(tile.area() for tile in self.capped + self.failed)
+        return max(0.0, 1 - missing / self.bbox.area()) if self.bbox.area() else 0.0
+
+    def as_dict(self):
+        return {
+            'tiles_searched': self.searched,
+            'tiles_split': self.split,
+            'tiles_capped': len(self.capped),
+            'tiles_failed': len(self.failed),
+            'tiles_by_depth': dict(sorted(self.depths.items())),
+            'results': self.produced,
+            'unique_businesses': self.added,
+            'duplicate_share': round(1 - self.added / self.produced, 3) if self.produced else 0.0,
+            'complete_share': round(self.complete_share(), 4),
+        }
+
+    def summary(self):
+        data = self.as_dict()
+        return (f"{data['tiles_searched']} tiles ({data['tiles_split']} split, {data['tiles_capped']} capped, "
+                f"{data['tiles_failed']} failed), {data['unique_businesses']} unique of {data['results']} results, "
+                f"{data['complete_share']:.1%} of the box below the cap")
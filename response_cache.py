@@ -0,0 +1,183 @@
+"""Content-addressed on-disk cache of fetched pages for repeat crawls"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+
+class CacheEntry:
+    """One cached page: body, HTTP validators and the extraction results"""
+
+    def __init__(self, key, body_hash, etag, last_modified, tier, fetched_at, size, results):
+        self.key = key
+        self.body_hash = body_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.tier = tier  # 'static' or 'browser'; the tier that produced the body
+        self.fetched_at = fetched_at
+        self.size = size
+        self.results = results  # {'emails': [...], 'links': {...}} or None
+        self.body = None
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
+    def validators(self):
+        """Headers for a conditional GET, empty when the server gave none"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Pages keyed by canonical URL, bodies stored once per content hash, LRU-bounded"""
+
+    def __init__(self, directory, ttl=7 * 24 * 3600, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl  # Seconds a page is served without revalidation
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'bytes_saved': 0}
+        self.db = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                tier TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                results TEXT
+            )
+        ''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at)')
+        self.db.commit()
+        return self
+
+    def _object_path(self, body_hash):
+        return os.path.join(self.directory, 'objects', body_hash[:2], body_hash)
+
+    def get(self, key):
+        """Return the cached entry with its body loaded, or None"""
+        with self._lock:
+            row = self.db.execute(
+                'SELECT key, body_hash, etag, last_modified, tier, fetched_at, size, results '
+                'FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row[:7], json.loads(row[7]) if row[7] else None)
+        try:
+            with open(self._object_path(entry.body_hash), encoding='utf-8') as f:
+                entry.body = f.read()
+        except OSError:
+            self.delete(key)  # Body evicted or lost; treat as a miss
+            return None
+        return entry
+
+    def put(self, key, body, etag=None, last_modified=None, tier='static', results=None):
+        """Store a freshly fetched page and evict old entries if over the size budget"""
+        data = body.encode('utf-8')
+        body_hash = hashlib.sha256(data).hexdigest()
+        path = self._object_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            old = self.db.execute('SELECT body_hash FROM entries WHERE key = ?', (key,)).fetchone()
+            self.db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, body_hash, etag, last_modified, tier, now, now, len(data),
+                 json.dumps(results) if results is not None else None)
+            )
+            self.db.commit()
+            if old and old[0] != body_hash:
+                self._release_object(old[0])
+        self.evict()
+
+    def touch(self, key, revalidated=False):
+        """Mark an entry as used; a successful revalidation also restarts its TTL"""
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self.db.execute('UPDATE entries SET accessed_at = ?, fetched_at = ? WHERE key = ?', (now, now, key))
+            else:
+                self.db.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+            self.db.commit()
+
+    def delete(self, key):
+        with self._lock:
+            row = self.db.execute('SELECT body_hash FROM entries WHERE key = ?', (key,)).fetchone()
+            if row:
+                self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self.db.commit()
+                self._release_object(row[0])
+
+    def _release_object(self, body_hash):
+        """Delete a body file once no entry references it; caller holds the lock"""
+        in_use = self.db.execute('SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1', (body_hash,)).fetchone()
+        if not in_use:
+            try:
+                os.remove(self._object_path(body_hash))
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, body_hash, size in self.db.execute(
+                'SELECT key, body_hash, size FROM entries ORDER BY accessed_at'
+            ).fetchall():
+                self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._release_object(body_hash)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            self.db.commit()
+
+    def clear(self):
+        """Drop every cached page and its body"""
+        with self._lock:
+            self.db.execute('DELETE FROM entries')
+            self.db.commit()
+            shutil.rmtree(os.path.join(self.directory, 'objects'), ignore_errors=True)
+            os.makedirs(os.path.join(self.directory, 'objects'), exist_ok=True)
+
+    def record(self, outcome, saved_bytes=0):
+        self.stats[outcome] += 1
+        self.stats['bytes_saved'] += saved_bytes
+
+    def summary(self):
+        lookups = self.stats['hits'] + self.stats['revalidated'] + self.stats['misses']
+        if not lookups:
+            return "no lookups"
+        reused = self.stats['hits'] + self.stats['revalidated']
+        return (f"{reused / lookups:.0%} hit ratio ({self.stats['hits']} fresh, "
+                f"{self.stats['revalidated']} revalidated, {self.stats['misses']} missed), "
+                f"{self.stats['bytes_saved'] / 1024 / 1024:.1f} MB not refetched")
+
+    def close(self):
+        if self.db:
+            self.db.close()
+            self.db = None
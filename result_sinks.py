@@ -0,0 +1,159 @@
+"""Streaming result sinks: append each email or business record as it is found"""
+import csv
+import json
+import os
+import sqlite3
+import threading
+
+
+class ResultSink:
+    """Buffered, thread-safe appender; a background thread flushes (and fsyncs) it
+
+    Writers only append to the buffer, so a crawl's event loop never waits on
+    the disk; the thread writes every flush_interval seconds, or as soon as
+    batch_size records are waiting.
+    """
+
+    def __init__(self, path, fields, batch_size=50, flush_interval=1.0, fsync=True):
+        self.path = path
+        self.fields = list(fields)  # Column order for tabular backends
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # Seconds a record may sit in the buffer
+        self.fsync = fsync
+        self.count = 0
+        self._buffer = []
+        self._lock = threading.Lock()  # Guards the buffer only, never held during I/O
+        self._write_lock = threading.Lock()  # Keeps batches in order between the thread and close()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._flusher = None
+
+    def open(self):
+        self.open_backend()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        return self
+
+    def open_backend(self):
+        pass
+
+    def _flush_periodically(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def write(self, record):
+        self.write_many([record])
+
+    def write_many(self, records):
+        with self._lock:
+            self._buffer.extend(records)
+            self.count += len(records)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            if records:
+                self.write_records(records)
+
+    def write_records(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        self._closed.set()
+        self._wake.set()
+        if self._flusher:
+            self._flusher.join()
+        self.flush()
+        self.close_backend()
+
+    def close_backend(self):
+        pass
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FileSink(ResultSink):
+    """Base for text file backends: append mode, fsync after each flush"""
+
+    def open_backend(self):
+        self.file = open(self.path, 'a', encoding='utf-8', newline='')
+        self.new_file = self.file.tell() == 0
+
+    def write_records(self, records):
+        self.write_lines(records)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def close_backend(self):
+        self.file.close()
+
+
+class JsonlSink(FileSink):
+    def write_lines(self, records):
+        self.file.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+
+class CsvSink(FileSink):
+    def open_backend(self):
+        super().open_backend()
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fields, extrasaction='ignore')
+        if self.new_file:
+            self.writer.writeheader()
+
+    def write_lines(self, records):
+        self.writer.writerows(flatten_record(record) for record in records)
+
+
+class SqliteSink(ResultSink):
+    """One TEXT column per field in a 'results' table (WAL, so readers can follow along)"""
+
+    def open_backend(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        if not self.fsync:
+            self.db.execute('PRAGMA synchronous=OFF')
+        columns = ', '.join(f'"{field}" TEXT' for field in self.fields)
+        self.db.execute(f'CREATE TABLE IF NOT EXISTS results ({columns})')
+        self.db.commit()
+        self.insert = f'INSERT INTO results VALUES ({", ".join("?" for _ in self.fields)})'
+
+    def write_records(self, records):
+        with self.db:
+            self.db.executemany(self.insert, [
+                [flatten_record(record).get(field) for field in self.fields] for record in records
+            ])
+
+    def close_backend(self):
+        self.db.close()
+
+
+def flatten_record(record):
+    """Join list values so tabular backends get one cell per field"""
+    return {key: ', '.join(map(str, value)) if isinstance(value, list) else value
+            for key, value in record.items()}
+
+
+SINK_TYPES = {
+    '.jsonl': JsonlSink,
+    '.ndjson': JsonlSink,
+    '.csv': CsvSink,
+    '.sqlite': SqliteSink,
+    '.db': SqliteSink,
+}
+
+
+def open_sink(path, fields, **kwargs):
+    """Open the backend matching the file extension; unknown extensions get JSON lines"""
+    sink_type = SINK_TYPES.get(os.path.splitext(path)[1].lower(), JsonlSink)
+    return sink_type(path, fields, **kwargs).open()
@@ -0,0 +1,151 @@
+"""Tk results list that stays responsive with 100k rows, fed by a coalescing update pump"""
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+
+class UiUpdater:
+    """Collects updates from worker threads and applies them on the Tk thread once per frame
+
+    Rows for a view are appended in one batch per frame, ordered calls run in
+    posting order, and 'latest' updates (progress, counters) keep only the
+    newest value so labels are redrawn at most once per frame.
+    """
+
+    def __init__(self, root, interval_ms=100, max_items=5000):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_items = max_items  # Queue entries drained per frame at most
+        self._queue = queue.SimpleQueue()
+        self._latest = {}
+        self._lock = threading.Lock()
+        self.root.after(self.interval_ms, self._tick)
+
+    def add_rows(self, view, rows):
+        self._queue.put(('rows', view, rows))
+
+    def call(self, callback, *args):
+        self._queue.put(('call', callback, args))
+
+    def set_latest(self, key, callback, *args):
+        with self._lock:
+            self._latest[key] = (callback, args)
+
+    def _tick(self):
+        try:
+            self.drain()
+        finally:
+            self.root.after(self.interval_ms, self._tick)
+
+    def drain(self):
+        pending_rows = {}
+        for _ in range(self.max_items):
+            try:
+                kind, target, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'rows':
+                pending_rows.setdefault(target, []).extend(payload)
+            else:
+                # Updates posted before a call must be visible when it runs
+                self._flush_rows(pending_rows)
+                self._apply_latest()
+                target(*payload)
+        self._flush_rows(pending_rows)
+        self._apply_latest()
+
+    def _apply_latest(self):
+        with self._lock:
+            latest, self._latest = self._latest, {}
+        for callback, args in latest.values():
+            callback(*args)
+
+    def _flush_rows(self, pending_rows):
+        for view, rows in pending_rows.items():
+            view.extend(rows)
+        pending_rows.clear()
+
+
+class VirtualList(ttk.Frame):
+    """Treeview that only holds the visible rows; the data lives in a Python list"""
+
+    def __init__(self, parent, columns, headings=None, widths=None, row_height=20):
+        super().__init__(parent)
+        self.rows = []
+        self.offset = 0  # Index of the first visible row
+        self.follow = True  # Keep the newest rows in view until the user scrolls up
+        self.row_height = row_height
+
+        style = ttk.Style(self)
+        style.configure('Virtual.Treeview', rowheight=row_height)
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', style='Virtual.Treeview',
+                                 selectmode='browse')
+        for index, column in enumerate(columns):
+            self.tree.heading(column, text=headings[index] if headings else column)
+            if widths:
+                self.tree.column(column, width=widths[index], stretch=True)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.tree.bind('<Configure>', lambda event: self.refresh())
+        self.tree.bind('<MouseWheel>', lambda event: self.scroll_by(-1 if event.delta > 0 else 1, 'units'))
+        self.tree.bind('<Button-4>', lambda event: self.scroll_by(-1, 'units'))
+        self.tree.bind('<Button-5>', lambda event: self.scroll_by(1, 'units'))
+
+    def visible_count(self):
+        # Leave room for the heading row
+        return max(1, self.tree.winfo_height() // self.row_height - 1)
+
+    def extend(self, rows):
+        self.rows.extend(rows)
+        if self.follow:
+            self.offset = max(0, len(self.rows) - self.visible_count())
+        self.refresh()
+
+    def set_row(self, index, row):
+        """Replace one row, e.g. after its record was updated"""
+        self.rows[index] = row
+        if self.offset <= index < self.offset + self.visible_count():
+            self.refresh()
+
+    def clear(self):
+        self.rows = []
+        self.offset = 0
+        self.follow = True
+        self.refresh()
+
+    def scroll_by(self, amount, unit):
+        step = self.visible_count() if unit == 'pages' else 3
+        self.scroll_to(self.offset + int(amount) * step)
+        return 'break'
+
+    def scroll_to(self, offset):
+        last_offset = max(0, len(self.rows) - self.visible_count())
+        self.offset = min(max(0, offset), last_offset)
+        self.follow = self.offset == last_offset
+        self.refresh()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        else:
+            self.scroll_by(amount, unit)
+
+    def refresh(self):
+        """Reuse one Treeview item per visible slot and only rewrite their values"""
+        count = min(self.visible_count(), max(0, len(self.rows) - self.offset))
+        items = self.tree.get_children()
+        if len(items) > count:
+            self.tree.delete(*items[count:])
+            items = items[:count]
+        for _ in range(count - len(items)):
+            self.tree.insert('', tk.END)
+        for item, row in zip(self.tree.get_children(), self.rows[self.offset:self.offset + count]):
+            self.tree.item(item, values=row)
+
+        if self.rows:
+            self.scrollbar.set(self.offset / len(self.rows), (self.offset + count) / len(self.rows))
+        else:
+            self.scrollbar.set(0, 1)
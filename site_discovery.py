@@ -0,0 +1,93 @@
+"""robots.txt and sitemap discovery: list a site's pages without crawling its links"""
+import logging
+import zlib
+from collections import deque
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+
+SITEMAP_CHUNK = 64 * 1024
+
+
+async def fetch_robots(session, root_url):
+    """Parsed robots.txt of the site, or None when it is missing or unreadable"""
+    try:
+        async with session.get(f"{root_url}/robots.txt", allow_redirects=True) as response:
+            if response.status >= 400:
+                return None
+            text = await response.text(errors='replace')
+    except Exception as e:
+        logging.debug(f"robots.txt fetch failed for {root_url}: {str(e)}")
+        return None
+    robots = RobotFileParser()
+    robots.parse(text.splitlines())
+    return robots
+
+
+async def read_sitemap(session, url, limit):
+    """Stream one sitemap (plain or gzipped); returns (child sitemaps, page URLs)
+
+    The XML is parsed as it arrives and the download stops once limit page
+    URLs have been read, so large sitemaps never sit in memory whole.
+    """
+    children, pages = [], []
+    try:
+        async with session.get(url, allow_redirects=True) as response:
+            if response.status >= 400:
+                return children, pages
+            parser = ElementTree.XMLPullParser(events=('start', 'end'))
+            decompressor = None
+            root = None
+            loc = None
+            first = True
+            async for chunk in response.content.iter_chunked(SITEMAP_CHUNK):
+                # .xml.gz files arrive as raw gzip, not as Content-Encoding
+                if first and chunk[:2] == b'\x1f\x8b':
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                first = False
+                parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+                for event, element in parser.read_events():
+                    tag = element.tag.rsplit('}', 1)[-1]
+                    if event == 'start':
+                        if root is None:
+                            root = element
+                        continue
+                    if tag == 'loc':
+                        loc = (element.text or '').strip()
+                    elif tag in ('sitemap', 'url'):
+                        if loc:
+                            (children if tag == 'sitemap' else pages).append(loc)
+                        loc = None
+                        root.clear()  # Drop parsed entries as we go
+                if len(pages) >= limit:
+                    return children, pages[:limit]
+    except ElementTree.ParseError as e:
+        logging.debug(f"Sitemap {url} is not valid XML: {str(e)}")
+    except Exception as e:
+        logging.debug(f"Sitemap fetch failed for {url}: {str(e)}")
+    return children, pages
+
+
+async def discover_site_urls(session, base_url, max_urls=5000, max_sitemaps=10):
+    """Page URLs listed in the site's sitemaps (found via robots.txt), minus disallowed ones"""
+    parsed = urlparse(base_url)
+    root_url = f"{parsed.scheme}://{parsed.netloc}"
+    robots = await fetch_robots(session, root_url)
+    sitemaps = (robots.site_maps() if robots else None) or [f"{root_url}/sitemap.xml"]
+
+    pending = deque(sitemaps)
+    read = set()
+    urls = []
+    while pending and len(read) < max_sitemaps and len(urls) < max_urls:
+        sitemap_url = pending.popleft()
+        if sitemap_url in read:
+            continue
+        read.add(sitemap_url)
+        children, pages = await read_sitemap(session, sitemap_url, max_urls - len(urls))
+        pending.extend(children)
+        urls.extend(pages)
+
+    if robots:
+        urls = [url for url in urls if robots.can_fetch('*', url)]
+    logging.info(f"Sitemaps of {root_url}: {len(urls)} URLs from {len(read)} sitemap(s)")
+    return urls
@@ -0,0 +1,44 @@
+import os
+
+from maps_payload import decode_body, parse_search_payload
+from maps_tiles import place_coordinates
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_recorded_pagination_response():
+    businesses = parse_search_payload(read_fixture('maps_search_response.txt'))
+    assert [business['name'] for business in businesses] == [
+        'Blue Bottle Coffee', 'Joe Coffee Company', 'Ninth Street Espresso'
+    ]
+    assert businesses[0] == {
+        'name': 'Blue Bottle Coffee',
+        'rating': '4.5',
+        'reviews': '1287',
+        'type': 'Coffee shop',
+        'location': '450 W 15th St, New York, NY 10011',
+        'hours': 'Open ⋅ Closes 6 PM',
+        'phone': '(510) 653-3394',
+        'website': 'https://bluebottlecoffee.com/',
+        'link': 'https://www.google.com/maps/place/data=!4m5!3m4!1s0x89c25a2e4c8b3f1d:0x4b8e3c1f0a9d2e71'
+                '!8m2!3d40.7422000!4d-74.0061000',
+    }
+    # Fields missing from the payload are left out rather than guessed
+    assert 'website' not in businesses[1]
+    assert set(businesses[2]) == {'name', 'type', 'location', 'link'}
+    assert place_coordinates(businesses[2]) == (40.7424, -74.006)
+
+
+def test_malformed_bodies_decode_to_none():
+    truncated = read_fixture('maps_search_response.txt')[:1000]
+    assert decode_body(truncated) is None
+    assert decode_body('{"c": 0, "d": ")]}\'\\n[[1, 2"}') is None
+    assert decode_body('<script>window.APP_INITIALIZATION_STATE=[null, null, null, [null, null, ")]}\'\\n[["]]];'
+                       '</script>') is None
+    assert decode_body('<html>no payload here</html>') is None
+    assert parse_search_payload('{"c": 0, "d": "not json"}') == []
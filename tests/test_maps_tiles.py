@@ -0,0 +1,98 @@
+import pytest
+
+from maps_tiles import Tile, TileCoverage, merge_businesses, needs_split, parse_bbox, plan_tiles, tile_url
+
+BBOX = Tile(40.0, -74.0, 41.0, -73.0)
+
+
+def business(name, fid, lat=None, lng=None):
+    link = f"https://www.google.com/maps/place/{name}/data=!4m7!3m6!1s{fid}"
+    if lat is not None:
+        link += f"!8m2!3d{lat}!4d{lng}"
+    return {'name': name, 'link': link + '!16s%2Fg%2F1tfz'}
+
+
+def test_plan_tiles_covers_the_box_exactly():
+    tiles = plan_tiles(BBOX, 3, 4)
+    assert len(tiles) == 12
+    assert sum(tile.area() for tile in tiles) == pytest.approx(BBOX.area())
+    # Edge tiles end on the box itself, not on an accumulated float step
+    assert max(tile.north for tile in tiles) == BBOX.north
+    assert max(tile.east for tile in tiles) == BBOX.east
+    assert tiles[0].bounds() == pytest.approx((40.0, -74.0, 40.0 + 1 / 3, -73.75))
+    assert all(tile.depth == 0 for tile in tiles)
+
+
+def test_split_into_quadrants_up_to_max_depth():
+    quadrants = BBOX.split()
+    assert [tile.bounds() for tile in quadrants] == [
+        (40.0, -74.0, 40.5, -73.5),
+        (40.0, -73.5, 40.5, -73.0),
+        (40.5, -74.0, 41.0, -73.5),
+        (40.5, -73.5, 41.0, -73.0),
+    ]
+    assert {tile.depth for tile in quadrants} == {1}
+    assert needs_split(120, 100, quadrants[0], max_depth=2)
+    assert not needs_split(99, 100, quadrants[0], max_depth=2)
+    deepest = quadrants[0].split()[0]
+    assert deepest.depth == 2
+    assert not needs_split(120, 100, deepest, max_depth=2)
+
+
+def test_tile_url_centres_the_search():
+    url = tile_url('coffee shop', BBOX)
+    assert url.startswith('https://www.google.com/maps/search/coffee%20shop/@40.500000,-73.500000,')
+
+
+def test_parse_bbox_rejects_inverted_boxes():
+    assert parse_bbox('40,-74,41,-73') == BBOX
+    with pytest.raises(ValueError):
+        parse_bbox('41,-74,40,-73')
+    with pytest.raises(ValueError):
+        parse_bbox('40,-74,41')
+
+
+def test_merge_drops_places_outside_the_box():
+    inside = business('Inside', '0x1:0xa', 40.5, -73.5)
+    outside = business('Outside', '0x2:0xb', 41.2, -73.5)
+    unplaced = business('Unplaced', '0x3:0xc')
+    merged = merge_businesses([[inside, outside, unplaced]], set(), BBOX)
+    assert merged == [inside, unplaced]
+    # Without a box nothing is filtered
+    assert merge_businesses([[outside]], set()) == [outside]
+
+
+def test_merge_dedups_across_tiles():
+    seen = set()
+    first = merge_businesses(
+        [[business('A', '0x1:0xa', 40.2, -73.8), business('B', '0x2:0xb', 40.2, -73.2)]], seen, BBOX
+    )
+    # The neighbouring tile returns B again, under a different link shape
+    second = merge_businesses([[business('B', '0x2:0xb'), business('C', '0x3:0xc', 40.8, -73.2)]], seen, BBOX)
+    assert [item['name'] for item in first] == ['A', 'B']
+    assert [item['name'] for item in second] == ['C']
+    assert len(seen) == 3
+
+
+def test_coverage_summary():
+    coverage = TileCoverage(BBOX)
+    planned = plan_tiles(BBOX, 2, 2)
+    coverage.record(planned[0], 120, 100, split=True, capped=True)
+    coverage.record(planned[1], 40, 30)
+    coverage.record(planned[2], 100, 60, capped=True)
+    coverage.record_failure(planned[3])
+    for quadrant in planned[0].split():
+        coverage.record(quadrant, 20, 5)
+    data = coverage.as_dict()
+    assert data['tiles_searched'] == 7
+    assert data['tiles_split'] == 1
+    assert data['tiles_capped'] == 1
+    assert data['tiles_failed'] == 1
+    assert data['tiles_by_depth'] == {0: 3, 1: 4}
+    assert data['results'] == 340
+    assert data['unique_businesses'] == 210
+    assert data['duplicate_share'] == round(1 - 210 / 340, 3)
+    # The capped and the failed tile each miss a quarter of the box
+    assert data['complete_share'] == 0.5
+    assert coverage.summary() == ("7 tiles (1 split, 1 capped, 1 failed), 210 unique of 340 results, "
+                                  "50.0% of the box below the cap")